@@ -3,30 +3,30 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
+# Only the notices helpers are imported up front; package resolution is
+# imported when the family checks actually run (not at all with --format-only).
 from third_party_common import (
-    ASSETS,
+    CHECK_CACHE,
     CS_PROJ,
-    FAMILIES_CFG,
     MANUAL_DEPENDENCIES,
     MANUAL_SECTIONS,
     NOTICES,
-    clean_license_text,
     family_for_package,
-    has_placeholders,
-    load_assets,
-    load_central_versions,
-    load_direct_packages,
-    load_families_config,
-    read_sections,
-    resolve_packages,
+    load_notices_index,
+    normalize_license,
+    read_section,
+    write_text_if_changed,
 )
 
 KEYWORDS = ["license", "permission", "copyright", "apache", "mit", "bsd", "gpl"]
+# Bump whenever check_section or the family checks change, to invalidate cached results.
+RULES_VERSION = 1
 
 
 def check_alphabetical(titles: List[str]) -> Tuple[bool, List[str]]:
@@ -49,15 +49,68 @@ def check_indentation(lines: List[str], prefix: str = "    ") -> Tuple[bool, str
     return True, ""
 
 
-def expected_family_map() -> Dict[str, List[str]]:
-    central_versions = load_central_versions()
-    assets = load_assets()
-    direct = load_direct_packages()
-    resolved = resolve_packages(direct, central_versions, assets)
-    _, package_to_family = load_families_config(FAMILIES_CFG)
+def check_section(body: str) -> List[str]:
+    """Problems found in one section body, without the section title."""
+    problems: List[str] = []
+    lines = body.splitlines()
+    if not contains_keyword(lines):
+        problems.append("missing recognizable license header.")
+    ind_ok, ind_reason = check_indentation(lines)
+    if not ind_ok:
+        problems.append(f"indentation issue ({ind_reason}).")
+    normalized = normalize_license(body)
+    if not normalized.cleaned:
+        problems.append("empty license text.")
+    if normalized.has_placeholders:
+        problems.append("contains placeholder copyright/year fields.")
+    return problems
+
+
+def family_inputs_fingerprint(solution: Optional[Path] = None, transitive: bool = False) -> str:
+    """Cheap fingerprint (paths, sizes, mtimes) of everything ``expected_family_map`` reads."""
+    from third_party_common import FAMILIES_CFG, load_solution_projects
+
+    files = [FAMILIES_CFG, Path(__file__).resolve().with_name("third_party_common.py")]
+    projects = [CS_PROJ]
+    if solution:
+        files.append(solution)
+        # Test projects too: whether a project counts as one can change its packages.
+        projects = load_solution_projects(solution, include_tests=True)
+    for project in projects:
+        files.append(project)
+        if transitive:
+            files.append(project.parent / "obj" / "project.assets.json")
+    digest = hashlib.sha256(f"{RULES_VERSION}\0{solution}\0{transitive}".encode("utf-8"))
+    for path in files:
+        try:
+            stat = path.stat()
+            digest.update(f"\0{path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            digest.update(f"\0{path}:missing".encode("utf-8"))
+    return digest.hexdigest()
+
 
+def load_check_cache(path: Path = CHECK_CACHE) -> Dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("rules_version") == RULES_VERSION:
+            return data
+    except Exception:
+        pass
+    return {"rules_version": RULES_VERSION, "sections": {}}
+
+
+def save_check_cache(data: Dict, path: Path = CHECK_CACHE) -> None:
+    try:
+        write_text_if_changed(path, json.dumps(data, indent=2))
+    except OSError:
+        pass
+
+
+def family_map(packages: List[str], package_to_family: Dict[str, str]) -> Dict[str, List[str]]:
+    """Expected notices families of ``packages`` plus the manual dependencies."""
     families: Dict[str, List[str]] = {}
-    for pkg in direct:
+    for pkg in packages:
         fam = family_for_package(pkg, package_to_family)
         families.setdefault(fam, []).append(pkg)
     for entry in MANUAL_DEPENDENCIES:
@@ -67,39 +120,37 @@ def expected_family_map() -> Dict[str, List[str]]:
     return families
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(description="Check THIRD-PARTY-NOTICES.md rules.")
-    parser.add_argument("--notices", type=Path, default=NOTICES)
-    parser.add_argument("--trace", type=Path, help="Write diagnostics json to this path.")
-    args = parser.parse_args()
+def expected_family_map(solution: Optional[Path] = None, transitive: bool = False) -> Dict[str, List[str]]:
+    """Expected families of the referenced packages; versions are not needed, so nothing is resolved."""
+    from third_party_common import (
+        FAMILIES_CFG,
+        AssetsIndex,
+        load_assets,
+        load_direct_packages,
+        load_families_config,
+        load_solution_projects,
+    )
 
-    preamble, sections = read_sections(args.notices)
-    titles = list(sections.keys())
-    if not titles:
-        print(f"No sections found in {args.notices}", file=sys.stderr)
-        return 2
+    direct: List[str] = []
+    seen = set()
+    for project in load_solution_projects(solution) if solution else [CS_PROJ]:
+        packages = load_direct_packages(project)
+        if transitive and packages:
+            # Only the dependency graph is needed, so only the targets section is loaded.
+            assets = load_assets(project.parent / "obj" / "project.assets.json", sections=("targets",))
+            packages = AssetsIndex(assets).closure(packages)
+        for pkg in packages:
+            if pkg not in seen:
+                seen.add(pkg)
+                direct.append(pkg)
+    _, package_to_family = load_families_config(FAMILIES_CFG)
+    return family_map(direct, package_to_family)
 
+
+def check_families(titles: List[str], families: Dict[str, List[str]]) -> Tuple[List[str], List[str]]:
+    """Errors and warnings about sections that do not match the expected families."""
     errors: List[str] = []
     warnings: List[str] = []
-
-    ok, expected_order = check_alphabetical(titles)
-    if not ok:
-        errors.append("Sections are not in alphabetical order.")
-
-    for title, body in sections.items():
-        lines = body.splitlines()
-        if not contains_keyword(lines):
-            errors.append(f"{title}: missing recognizable license header.")
-        ind_ok, ind_reason = check_indentation(lines)
-        if not ind_ok:
-            errors.append(f"{title}: indentation issue ({ind_reason}).")
-        cleaned = clean_license_text(body)
-        if not cleaned:
-            errors.append(f"{title}: empty license text.")
-        if has_placeholders(cleaned):
-            errors.append(f"{title}: contains placeholder copyright/year fields.")
-
-    families = expected_family_map()
     expected_titles = set(families.keys()) | MANUAL_SECTIONS
 
     # Detect extra sections not mapped to direct dependencies or manual allowance.
@@ -124,22 +175,56 @@ def main() -> int:
                 warnings.append(f"{fam}: multiple packages present but not grouped.")
             if fam in title_set and members_without_family_name:
                 errors.append(f"{fam}: family header present alongside individual members.")
+    return errors, warnings
 
-    diagnostics = {
-        "preamble_lines": len(preamble.splitlines()),
-        "sections_count": len(sections),
-        "alphabetical_ok": ok,
-        "expected_order": expected_order,
-        "titles": titles,
-        "errors": errors,
-        "warnings": warnings,
-    }
 
-    if args.trace:
-        args.trace.parent.mkdir(parents=True, exist_ok=True)
-        args.trace.write_text(json.dumps(diagnostics, indent=2), encoding="utf-8")
-        print(f"Wrote diagnostics to {args.trace}")
+def read_preamble(path: Path, index: Dict) -> str:
+    with path.open("rb") as fh:
+        return fh.read(index["preamble"]["length"]).decode("utf-8")
+
+
+def check_notices(
+    sections: Dict[str, Dict],
+    read_body: Callable[[str], Optional[str]],
+    families: Optional[Dict[str, List[str]]],
+    cache: Dict,
+) -> Tuple[List[str], List[str], int]:
+    """Run every check over indexed notices sections (``{title: {"hash": ...}}``).
 
+    ``read_body`` is only called for sections without a cached result; the
+    family checks are skipped when ``families`` is None. Returns the errors,
+    the warnings and how many sections were revalidated.
+    """
+    titles = list(sections.keys())
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    if not check_alphabetical(titles)[0]:
+        errors.append("Sections are not in alphabetical order.")
+
+    # Only sections whose content hash is not in the cache are read and revalidated.
+    section_results: Dict[str, List[str]] = {}
+    revalidated = 0
+    for title, entry in sections.items():
+        digest = entry["hash"]
+        if digest not in section_results:
+            problems = cache["sections"].get(digest)
+            if problems is None:
+                problems = check_section(read_body(title) or "")
+                revalidated += 1
+            section_results[digest] = problems
+        errors.extend(f"{title}: {problem}" for problem in section_results[digest])
+    cache["sections"] = section_results
+
+    if families is not None:
+        family_errors, family_warnings = check_families(titles, families)
+        errors.extend(family_errors)
+        warnings.extend(family_warnings)
+    return errors, warnings, revalidated
+
+
+def report(errors: List[str], warnings: List[str]) -> int:
+    """Print the check results; return 2 on errors, 1 on warnings only, else 0."""
     if errors:
         print("ERRORS:", file=sys.stderr)
         for e in errors:
@@ -160,5 +245,61 @@ def main() -> int:
     return 0
 
 
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check THIRD-PARTY-NOTICES.md rules.")
+    parser.add_argument("--notices", type=Path, default=NOTICES)
+    parser.add_argument("--trace", type=Path, help="Write diagnostics json to this path.")
+    parser.add_argument("--solution", type=Path, help="Expect packages from every project in this solution.")
+    parser.add_argument("--transitive", action="store_true", help="Expect transitive packages as well as direct ones.")
+    parser.add_argument("--no-cache", action="store_true", help="Revalidate every section and recompute the expected families.")
+    parser.add_argument(
+        "--format-only",
+        action="store_true",
+        help="Only validate the notices file itself; skip the family checks and all project/assets inputs.",
+    )
+    args = parser.parse_args()
+
+    index = load_notices_index(args.notices)
+    titles = list(index["sections"].keys())
+    if not titles:
+        print(f"No sections found in {args.notices}", file=sys.stderr)
+        return 2
+
+    ok, expected_order = check_alphabetical(titles)
+    cache = load_check_cache() if not args.no_cache else {"rules_version": RULES_VERSION, "sections": {}}
+    families = None
+    if not args.format_only:
+        fingerprint = family_inputs_fingerprint(args.solution, args.transitive)
+        if cache.get("family_fingerprint") == fingerprint:
+            families = cache["families"]
+        else:
+            families = expected_family_map(args.solution, args.transitive)
+            cache["family_fingerprint"] = fingerprint
+            cache["families"] = families
+    errors, warnings, revalidated = check_notices(
+        index["sections"], lambda title: read_section(args.notices, title, index), families, cache
+    )
+    if not args.no_cache:
+        save_check_cache(cache)
+
+    diagnostics = {
+        "preamble_lines": len(read_preamble(args.notices, index).strip().splitlines()),
+        "sections_count": len(titles),
+        "revalidated_sections": revalidated,
+        "alphabetical_ok": ok,
+        "expected_order": expected_order,
+        "titles": titles,
+        "errors": errors,
+        "warnings": warnings,
+    }
+
+    if args.trace:
+        args.trace.parent.mkdir(parents=True, exist_ok=True)
+        args.trace.write_text(json.dumps(diagnostics, indent=2), encoding="utf-8")
+        print(f"Wrote diagnostics to {args.trace}")
+
+    return report(errors, warnings)
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,122 @@
+"""The streaming assets reader must agree with json.loads on every layout.
+
+Run with: python3 -m unittest discover -s tools/tests
+"""
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import third_party_common  # noqa: E402
+from third_party_common import ASSETS_SECTIONS, TARGET_FIELDS, assets_fingerprint, load_assets  # noqa: E402
+
+ASSETS = {
+    "version": 3,
+    "targets": {
+        "net10.0": {
+            "Avalonia/11.3.8": {
+                "type": "package",
+                "dependencies": {"Avalonia.Remote.Protocol": "11.3.8", "MicroCom.Runtime": "0.11.0"},
+                "compile": {"ref/net8.0/Avalonia.Base.dll": {"related": ".xml"}},
+                "runtime": {"lib/net8.0/Avalonia.Base.dll": {"related": ".xml"}},
+            },
+            "Weird \"quoted\" {brace} \\ name/1.0.0": {
+                "type": "package",
+                "compile": {"lib/a\n  \"b.dll": {}},
+            },
+            "ProjectRover.Core/1.0.0": {"type": "project", "framework": ".NETCoreApp,Version=v10.0"},
+        },
+        "net10.0/linux-x64": {
+            "SkiaSharp.NativeAssets.Linux/3.119.1": {
+                "type": "package",
+                "dependencies": {"SkiaSharp": "3.119.1"},
+                "runtimeTargets": {"runtimes/linux-x64/native/libSkiaSharp.so": {"assetType": "native"}},
+            },
+        },
+        "net10.0/osx-arm64": {},
+    },
+    "libraries": {"Avalonia/11.3.8": {"sha512": "abc==", "files": ["a", "b"]}},
+    "packageFolders": {"/root/.nuget/packages/": {}},
+    "project": {"version": "1.0.0", "restore": {"projectName": "ProjectRover"}},
+    "logs": [{"code": "NU1603", "message": "line one\n  \"line two\""}],
+}
+
+
+def expected(data, sections=ASSETS_SECTIONS):
+    out = {k: data[k] for k in sections if k in data}
+    if "targets" in out:
+        out["targets"] = {
+            tfm: {key: {f: entry[f] for f in TARGET_FIELDS if f in entry} for key, entry in packages.items()}
+            for tfm, packages in out["targets"].items()
+        }
+    return out
+
+
+class LoadAssetsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "project.assets.json"
+
+    def load(self, text, sections=ASSETS_SECTIONS, encoding="utf-8"):
+        self.path.write_bytes(text.encode(encoding))
+        return load_assets(self.path, sections)
+
+    def test_nuget_layout(self):
+        self.assertEqual(self.load(json.dumps(ASSETS, indent=2)), expected(ASSETS))
+
+    def test_nuget_layout_is_streamed(self):
+        self.path.write_text(json.dumps(ASSETS, indent=2), encoding="utf-8")
+        with mock.patch.object(third_party_common.json, "loads", wraps=json.loads) as loads:
+            load_assets(self.path)
+        # Only package entries and small sections are decoded, never the whole file or a whole section.
+        largest = max(len(call.args[0]) for call in loads.call_args_list)
+        self.assertLess(largest, len(json.dumps(ASSETS["targets"]["net10.0"], indent=2)))
+
+    def test_crlf_and_bom(self):
+        text = json.dumps(ASSETS, indent=2).replace("\n", "\r\n")
+        self.assertEqual(self.load(text, encoding="utf-8-sig"), expected(ASSETS))
+
+    def test_section_subset(self):
+        text = json.dumps(ASSETS, indent=2)
+        self.assertEqual(self.load(text, ("targets",)), expected(ASSETS, ("targets",)))
+        self.assertEqual(self.load(text, ("packageFolders", "logs")), expected(ASSETS, ("packageFolders", "logs")))
+
+    def test_empty_targets(self):
+        data = {"version": 3, "targets": {}, "packageFolders": {}}
+        self.assertEqual(self.load(json.dumps(data, indent=2)), expected(data))
+
+    def test_other_layouts_fall_back(self):
+        for text in (
+            json.dumps(ASSETS),
+            json.dumps(ASSETS, indent=4),
+            json.dumps(ASSETS, indent=1),
+            json.dumps(ASSETS, indent="\t"),
+        ):
+            with self.subTest(text=text[:20]):
+                self.assertEqual(self.load(text), expected(ASSETS))
+
+    def test_whole_document(self):
+        self.assertEqual(self.load(json.dumps(ASSETS, indent=2), None), ASSETS)
+
+    def test_missing_or_invalid(self):
+        self.assertEqual(load_assets(self.path), {})
+        self.assertEqual(self.load('{\n  "targets": {\n    "net10.0": {\n'), {})
+
+    def test_fingerprint_ignores_other_sections(self):
+        self.path.write_text(json.dumps(ASSETS, indent=2), encoding="utf-8")
+        before = assets_fingerprint(self.path)
+        self.path.write_text(json.dumps(dict(ASSETS, logs=[], project={}), indent=2), encoding="utf-8")
+        self.assertEqual(assets_fingerprint(self.path), before)
+        changed = json.loads(json.dumps(ASSETS))
+        changed["targets"]["net10.0"]["Avalonia/11.3.8"]["type"] = "project"
+        self.path.write_text(json.dumps(changed, indent=2), encoding="utf-8")
+        self.assertNotEqual(assets_fingerprint(self.path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
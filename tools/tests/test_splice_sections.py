@@ -0,0 +1,56 @@
+"""Incremental notices updates must match a full render byte for byte.
+
+Run with: python3 -m unittest discover -s tools/tests
+"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from third_party_common import splice_sections  # noqa: E402
+from update_third_party import render_notices  # noqa: E402
+
+PREAMBLE = "# Third-Party Notices\n\nThis product bundles the components below.\n"
+SECTIONS = {
+    "Avalonia": "    The MIT License (MIT)\n    Copyright (c) AvaloniaUI OÜ",
+    "Serilog": "    Apache License\n    Version 2.0, January 2004",
+    "TomsToolbox": "    MIT License\n    Copyright (c) Tom Englert",
+}
+
+
+class SpliceSectionsTests(unittest.TestCase):
+    def assert_matches_full_render(self, updates):
+        current = render_notices(PREAMBLE, SECTIONS)
+        expected = render_notices(PREAMBLE, {**SECTIONS, **updates})
+        self.assertEqual(splice_sections(current, updates), expected)
+
+    def test_insert_at_start(self):
+        self.assert_matches_full_render({"Aaa.New": "    MIT License\n    Copyright (c) A"})
+
+    def test_insert_in_middle(self):
+        self.assert_matches_full_render({"Dock.Avalonia": "    MIT License\n    Copyright (c) Wiesław Šoltés"})
+
+    def test_insert_at_end(self):
+        self.assert_matches_full_render({"Zzz.New": "    MIT License\n    Copyright (c) Z"})
+
+    def test_insert_everywhere_and_replace(self):
+        self.assert_matches_full_render(
+            {
+                "Aaa.New": "    MIT License",
+                "Octokit": "    MIT License\n    Copyright (c) GitHub",
+                "Serilog": "    Apache License\n    Version 2.0 (updated)",
+                "Zzz.New": "    BSD License",
+            }
+        )
+
+    def test_replace_last_section(self):
+        self.assert_matches_full_render({"TomsToolbox": "    MIT License\n    Copyright (c) 2024 Tom Englert"})
+
+    def test_no_existing_sections(self):
+        updates = {"Serilog": SECTIONS["Serilog"]}
+        self.assertEqual(splice_sections(PREAMBLE, updates), render_notices(PREAMBLE, updates))
+
+
+if __name__ == "__main__":
+    unittest.main()
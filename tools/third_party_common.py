@@ -2,22 +2,32 @@
 """Shared helpers for third-party notice tooling."""
 from __future__ import annotations
 
-import html
+import hashlib
 import json
+import mmap
+import os
 import re
-import xml.etree.ElementTree as ET
+import threading
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# html, tempfile, xml.etree and concurrent.futures are imported where they are
+# used: the checker's pre-commit hook only needs the notices helpers.
 
 ROOT = Path(__file__).resolve().parents[1]
 CS_PROJ = ROOT / "src" / "ProjectRover" / "ProjectRover.csproj"
-PROPS = ROOT / "Directory.Packages.props"
 ASSETS = ROOT / "src" / "ProjectRover" / "obj" / "project.assets.json"
 NOTICES = ROOT / "THIRD-PARTY-NOTICES.md"
 FAMILIES_CFG = ROOT / "third-party-families.json"
 ORG_CFG = ROOT / "third-party-orgs.json"
 LICENSE_CACHE = ROOT / ".cache" / "licenses"
+HTTP_CACHE = ROOT / ".cache" / "http"
+NEGATIVE_CACHE = ROOT / ".cache" / "negative_licenses.json"
 RUNS_DIR = ROOT / ".cache" / "third_party_runs"
+MSBUILD_CACHE = ROOT / ".cache" / "msbuild_files.json"
+FINGERPRINT_FILE = ROOT / ".cache" / "update_fingerprint.json"
+NOTICES_INDEX = ROOT / ".cache" / "notices_index.json"
+CHECK_CACHE = ROOT / ".cache" / "check_cache.json"
 
 # Default grouping heuristics when no explicit mapping exists.
 DEFAULT_FAMILY_PREFIXES: List[Tuple[str, str]] = [
@@ -51,67 +61,561 @@ MANUAL_DEPENDENCIES = [
 MANUAL_SECTIONS = {"MICROSOFT VISUAL STUDIO 2022 IMAGE LIBRARY"}
 
 
-def load_central_versions(props_path: Path = PROPS) -> Dict[str, str]:
-    versions: Dict[str, str] = {}
-    if not props_path.exists():
-        return versions
+# Directory.*.props files the .NET SDK imports implicitly, in import order.
+IMPLICIT_PROPS = ("Directory.Build.props", "Directory.Packages.props")
+
+_MSBUILD_PROPERTY = re.compile(r"\$\((\w+)\)")
+_MSBUILD_FUNCTION = re.compile(r"\$\(\[MSBuild\]::(GetPathOfFileAbove|GetDirectoryNameOfFileAbove)\(([^)]*)\)\)")
+_msbuild_files: Optional[Dict[str, Dict]] = None
+_msbuild_dirty = False
+_msbuild_lock = threading.Lock()
+
+
+def find_file_above(start: Path, name: str) -> Optional[Path]:
+    """Return the nearest ``name`` in ``start`` or one of its parents, like MSBuild's GetPathOfFileAbove."""
+    for directory in [start, *start.parents]:
+        candidate = directory / name
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _read_msbuild_file(path: Path) -> Dict:
+    """Properties, PackageVersions and Imports of one MSBuild file, in document order.
+
+    Results are cached by path, mtime and size, in memory and in
+    ``MSBUILD_CACHE``, so unchanged files are not parsed again by later calls
+    or later runs.
+    """
+    global _msbuild_files, _msbuild_dirty
+    key = str(path.resolve())
+    st = path.stat()
+    stamp = [st.st_mtime_ns, st.st_size]
+    # The lock only guards the shared cache; files are parsed outside it, so projects evaluate in parallel.
+    with _msbuild_lock:
+        if _msbuild_files is None:
+            _msbuild_files = {}
+            try:
+                _msbuild_files = json.loads(MSBUILD_CACHE.read_text(encoding="utf-8"))
+            except Exception:
+                pass
+        cached = _msbuild_files.get(key)
+    if cached and cached.get("stamp") == stamp:
+        return cached
+    import xml.etree.ElementTree as ET
+
+    items: List[List[str]] = []
     try:
-        tree = ET.parse(props_path)
-        root = tree.getroot()
-        for pv in root.findall(".//{*}PackageVersion"):
-            inc = pv.get("Include")
-            ver = pv.get("Version")
-            if inc and ver:
-                versions[inc] = ver
+        root = ET.parse(path).getroot()
+        for node in root:
+            tag = node.tag.split("}")[-1]
+            if tag == "PropertyGroup":
+                for prop in node:
+                    items.append(["property", prop.tag.split("}")[-1], (prop.text or "").strip()])
+            elif tag == "ItemGroup":
+                for item in node:
+                    inc, ver = item.get("Include"), item.get("Version")
+                    if item.tag.split("}")[-1] == "PackageVersion" and inc and ver:
+                        items.append(["version", inc, ver])
+            elif tag == "Import" and node.get("Project"):
+                items.append(["import", node.get("Project"), ""])
     except Exception:
-        pass
-    return versions
+        items = []
+    info = {"stamp": stamp, "items": items}
+    with _msbuild_lock:
+        _msbuild_files[key] = info
+        _msbuild_dirty = True
+    return info
+
+
+def _save_msbuild_cache() -> None:
+    global _msbuild_dirty
+    with _msbuild_lock:
+        if not _msbuild_dirty or _msbuild_files is None:
+            return
+        try:
+            MSBUILD_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            MSBUILD_CACHE.write_text(json.dumps(_msbuild_files, indent=2, sort_keys=True), encoding="utf-8")
+            _msbuild_dirty = False
+        except OSError:
+            pass
 
 
-def load_direct_packages(csproj_path: Path = CS_PROJ) -> List[str]:
+def _expand_msbuild(value: str, props: Dict[str, str], this_dir: Path) -> str:
+    value = _MSBUILD_PROPERTY.sub(lambda m: props.get(m.group(1), ""), value)
+
+    def call(m: "re.Match") -> str:
+        args = [a.strip().strip("'\"") for a in m.group(2).split(",")]
+        if m.group(1) == "GetPathOfFileAbove":
+            name, start = args[0], (args[1] if len(args) > 1 and args[1] else str(this_dir))
+        else:
+            start, name = args[0], (args[1] if len(args) > 1 else "")
+        found = find_file_above((this_dir / start).resolve(), name) if name else None
+        if not found:
+            return ""
+        return str(found if m.group(1) == "GetPathOfFileAbove" else found.parent)
+
+    return _MSBUILD_FUNCTION.sub(call, value)
+
+
+def _evaluate_msbuild_file(path: Path, props: Dict[str, str], versions: Dict[str, str], seen: List[Path]) -> None:
+    path = path.resolve()
+    if path in seen or not path.is_file():
+        return
+    seen.append(path)
+    this_dir = path.parent
+    for kind, name, value in _read_msbuild_file(path)["items"]:
+        scope = dict(props, MSBuildThisFileDirectory=str(this_dir) + os.sep, MSBuildThisFile=path.name)
+        if kind == "property":
+            props[name] = _expand_msbuild(value, scope, this_dir)
+        elif kind == "version":
+            versions[name] = _expand_msbuild(value, scope, this_dir)
+        elif kind == "import":
+            target = _expand_msbuild(name, scope, this_dir)
+            if target and "*" not in target:
+                _evaluate_msbuild_file(this_dir / target, props, versions, seen)
+
+
+def evaluate_msbuild_props(project_path: Path = CS_PROJ, props_path: Optional[Path] = None) -> Tuple[Dict[str, str], Dict[str, str], List[Path]]:
+    """Evaluate the props files a project implicitly imports.
+
+    Walks up from the project directory to the nearest ``IMPLICIT_PROPS`` files
+    (or evaluates ``props_path`` alone when given) and follows their
+    ``<Import>`` chains. Conditions are not evaluated. Returns the properties,
+    the ``PackageVersion`` map and the files that were read.
+    """
+    props: Dict[str, str] = {"MSBuildProjectDirectory": str(project_path.parent.resolve())}
+    versions: Dict[str, str] = {}
+    seen: List[Path] = []
+    if props_path is not None:
+        _evaluate_msbuild_file(props_path, props, versions, seen)
+    else:
+        for name in IMPLICIT_PROPS:
+            found = find_file_above(project_path.parent, name)
+            if found:
+                _evaluate_msbuild_file(found, props, versions, seen)
+    _save_msbuild_cache()
+    return props, versions, seen
+
+
+def load_central_versions(props_path: Optional[Path] = None, project_path: Path = CS_PROJ) -> Dict[str, str]:
+    """Central package versions for ``project_path``, or from ``props_path`` and its imports."""
+    if props_path is not None and not props_path.exists():
+        return {}
+    return evaluate_msbuild_props(project_path, props_path)[1]
+
+
+_project_files: Dict[str, Dict] = {}
+
+
+def _read_project(csproj_path: Path) -> Dict:
+    """PackageReferences, their inline versions and whether it is a test project.
+
+    Each project file is parsed once per process (and again only if it changes),
+    however many of ``load_direct_packages``, ``load_inline_versions`` and
+    ``is_test_project`` ask for it.
+    """
+    try:
+        st = csproj_path.stat()
+    except OSError:
+        return {"packages": [], "versions": {}, "test": False}
+    key = str(csproj_path.resolve())
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _msbuild_lock:
+        cached = _project_files.get(key)
+    if cached and cached["stamp"] == stamp:
+        return cached
+    import xml.etree.ElementTree as ET
+
     packages: List[str] = []
-    if not csproj_path.exists():
-        return packages
+    versions: Dict[str, str] = {}
+    test = False
     try:
-        tree = ET.parse(csproj_path)
-        root = tree.getroot()
+        root = ET.parse(csproj_path).getroot()
+        for prop in root.findall(".//{*}IsTestProject"):
+            test = test or (prop.text or "").strip().lower() == "true"
         for pr in root.findall(".//{*}PackageReference"):
             inc = pr.get("Include")
-            if inc and inc not in packages:
+            if not inc:
+                continue
+            if inc not in packages:
                 packages.append(inc)
+            test = test or inc.lower() == "microsoft.net.test.sdk"
+            child = pr.find("{*}VersionOverride")
+            if child is None:
+                child = pr.find("{*}Version")
+            version = pr.get("VersionOverride") or pr.get("Version") or (child.text if child is not None else None)
+            if version and version.strip():
+                versions.setdefault(inc, version.strip())
     except Exception:
         pass
-    return packages
+    info = {"stamp": stamp, "packages": packages, "versions": versions, "test": test}
+    with _msbuild_lock:
+        _project_files[key] = info
+    return info
 
 
-def load_assets(assets_path: Path = ASSETS) -> Dict:
+def load_direct_packages(csproj_path: Path = CS_PROJ) -> List[str]:
+    return list(_read_project(csproj_path)["packages"])
+
+
+def load_inline_versions(csproj_path: Path = CS_PROJ) -> Dict[str, str]:
+    """``Version``/``VersionOverride`` given on the PackageReferences of a project itself."""
+    return dict(_read_project(csproj_path)["versions"])
+
+
+def is_test_project(csproj_path: Path) -> bool:
+    """Whether a project is a test project (``IsTestProject`` or a Microsoft.NET.Test.Sdk reference)."""
+    return _read_project(csproj_path)["test"]
+
+
+# Sections of project.assets.json the tooling reads; everything else is skipped.
+ASSETS_SECTIONS = ("targets", "packageFolders")
+# Fields kept for each package entry of a target.
+TARGET_FIELDS = ("type", "dependencies")
+
+_JSON_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_JSON_COLON = re.compile(rb"\s*:\s*")
+_JSON_WHITESPACE = b" \t\r\n"
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _json_key(token: bytes) -> str:
+    raw = token[1:-1]
+    return raw.decode("utf-8") if b"\\" not in raw else json.loads(token)
+
+
+def _trim_targets(targets: Dict) -> Dict:
+    return {
+        tfm: {key: {f: (entry or {}).get(f) for f in TARGET_FIELDS if f in (entry or {})} for key, entry in packages.items()}
+        for tfm, packages in targets.items()
+    }
+
+
+def _indented_starts(buf, start: int, end: int, indent: int) -> Tuple[List[int], int]:
+    """Key offsets and closing brace of the object spanning ``buf[start:end]``, found by indentation.
+
+    NuGet writes project.assets.json indented by two spaces per level, so
+    inside an object whose keys sit at ``indent`` spaces, a newline followed
+    by exactly that many spaces and a quote only ever starts one of its keys
+    (JSON strings cannot hold raw newlines). Raises ValueError when the
+    layout is not like that.
+    """
+    opening = buf.find(b"{", start, end)
+    closing = buf.rfind(b"}", start, end)
+    if opening == -1 or closing < opening:
+        raise ValueError("expected a JSON object")
+    marker = b"\n" + b" " * indent + b'"'
+    starts = []
+    pos = buf.find(marker, opening, closing)
+    while pos != -1:
+        starts.append(pos + len(marker) - 1)
+        pos = buf.find(marker, pos + len(marker), closing)
+    if not starts:
+        if buf[opening + 1:closing].strip(_JSON_WHITESPACE):
+            raise ValueError("not an indented JSON object")
+        return starts, closing
+    first = opening + 1
+    while buf[first:first + 1] in (b" ", b"\t", b"\r", b"\n"):
+        first += 1
+    if first != starts[0] or buf[closing - indent + 1:closing] != b"\n" + b" " * (indent - 2):
+        raise ValueError("not an indented JSON object")
+    return starts, closing
+
+
+def _indented_members(buf, start: int, end: int, indent: int) -> List[Tuple[str, int, int]]:
+    """``(key, value_start, value_end)`` of each member of an indented object (see ``_indented_starts``)."""
+    starts, closing = _indented_starts(buf, start, end, indent)
+    members = []
+    for i, key_start in enumerate(starts):
+        key_match = _JSON_STRING.match(buf, key_start)
+        colon = _JSON_COLON.match(buf, key_match.end()) if key_match else None
+        if colon is None or colon.end() == key_match.end():
+            raise ValueError("expected an object key")
+        last = i + 1 == len(starts)
+        value_end = closing if last else starts[i + 1] - indent - 1
+        while value_end > colon.end() and buf[value_end - 1:value_end] in (b" ", b"\t", b"\r", b"\n"):
+            value_end -= 1
+        if not last:
+            if buf[value_end - 1:value_end] != b",":
+                raise ValueError("expected ','")
+            value_end -= 1
+        members.append((_json_key(key_match.group()), colon.end(), value_end))
+    return members
+
+
+# Package entries decoded per call; bounds memory to a few entries at a time.
+ASSETS_BATCH = 64
+
+
+def _stream_assets(buf, sections: Iterable[str]) -> Dict:
+    """Decode ``sections`` of a NuGet-formatted assets file a few package entries at a time."""
+    wanted = set(sections)
+    assets: Dict = {}
+    for name, vstart, vend in _indented_members(buf, 0, len(buf), 2):
+        if name not in wanted:
+            continue
+        if name != "targets":
+            assets[name] = json.loads(buf[vstart:vend])
+            continue
+        targets: Dict[str, Dict] = {}
+        for tfm, tstart, tend in _indented_members(buf, vstart, vend, 4):
+            packages = targets[tfm] = {}
+            starts, closing = _indented_starts(buf, tstart, tend, 6)
+            for i in range(0, len(starts), ASSETS_BATCH):
+                # Sibling members are decoded together as one small object, then trimmed.
+                chunk_end = starts[i + ASSETS_BATCH] if i + ASSETS_BATCH < len(starts) else closing
+                chunk = buf[starts[i]:chunk_end].decode("utf-8").rstrip().rstrip(",")
+                for key, entry in _JSON_DECODER.decode("{" + chunk + "}").items():
+                    entry = entry or {}
+                    packages[key] = {f: entry[f] for f in TARGET_FIELDS if f in entry}
+        assets[name] = targets
+    return assets
+
+
+def load_assets(assets_path: Path = ASSETS, sections: Optional[Iterable[str]] = ASSETS_SECTIONS) -> Dict:
+    """Load project.assets.json.
+
+    Only ``sections`` are materialized, and target entries keep just
+    ``TARGET_FIELDS``. NuGet-formatted files are scanned through a memory map
+    and decoded a few package entries at a time, so the large ``libraries``,
+    ``project`` and ``logs`` sections are skipped without being decoded;
+    other layouts fall back to ``json.loads``. Pass ``sections=None`` to load
+    the whole document.
+    """
     if not assets_path.exists():
         return {}
     try:
-        return json.loads(assets_path.read_text(encoding="utf-8"))
+        if sections is None:
+            return json.loads(assets_path.read_text(encoding="utf-8"))
+        with assets_path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            try:
+                return _stream_assets(buf, sections)
+            except (ValueError, AttributeError):
+                pass
+        # Not laid out the way NuGet writes it; let the full parser decide.
+        data = json.loads(assets_path.read_text(encoding="utf-8-sig"))
+        assets = {k: data[k] for k in sections if k in data}
+        if "targets" in assets:
+            assets["targets"] = _trim_targets(assets["targets"])
+        return assets
     except Exception:
         return {}
 
 
-def resolve_packages(packages: Iterable[str], central_versions: Dict[str, str], assets: Dict) -> Dict[str, Dict]:
-    targets = next(iter((assets.get("targets") or {}).values()), {})
-    pkg_folders = list((assets.get("packageFolders") or {}).keys())
+def assets_fingerprint(assets_path: Path = ASSETS, sections: Iterable[str] = ASSETS_SECTIONS) -> str:
+    """SHA-256 over the raw bytes of ``sections`` of an assets file.
+
+    A restore that only rewrites logs or project metadata keeps the same
+    fingerprint. Falls back to hashing the whole file when its top-level
+    members cannot be located.
+    """
+    digest = hashlib.sha256()
+    if not assets_path.exists() or not assets_path.stat().st_size:
+        return digest.hexdigest()
+    wanted = set(sections)
+    with assets_path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        try:
+            for name, start, end in _indented_members(buf, 0, len(buf), 2):
+                if name in wanted:
+                    digest.update(name.encode("utf-8") + b"\0")
+                    digest.update(buf[start:end])
+        except (ValueError, AttributeError):
+            digest = hashlib.sha256(buf[:])
+    return digest.hexdigest()
+
+
+class AssetsIndex:
+    """Case-insensitive index of the package entries in project.assets.json targets.
+
+    Built once per assets file; maps the lowercased package id to its id,
+    version, type and dependencies so lookups do not rescan the target keys.
+    By default only the first target is indexed. With ``all_targets`` every
+    target framework and runtime identifier is folded into the same index in
+    a single pass: the first target a package appears in supplies its version,
+    dependencies are merged, and ``versions`` keeps the version per target.
+    """
+
+    def __init__(self, assets: Dict, all_targets: bool = False):
+        self.package_folders: List[str] = list((assets.get("packageFolders") or {}).keys())
+        targets = assets.get("targets") or {}
+        self.target_names: List[str] = list(targets)[: None if all_targets else 1]
+        self.packages: Dict[str, Dict] = {}
+        self.versions: Dict[str, Dict[str, str]] = {}
+        self._graph: Optional[Dict[str, List[str]]] = None
+        for target in self.target_names:
+            for key, value in (targets[target] or {}).items():
+                name, sep, version = key.partition("/")
+                if not sep:
+                    continue
+                value = value or {}
+                lowered = name.lower()
+                entry = self.packages.setdefault(
+                    lowered,
+                    {"id": name, "version": version, "type": value.get("type"), "dependencies": {}},
+                )
+                for dep, dep_range in (value.get("dependencies") or {}).items():
+                    entry["dependencies"].setdefault(dep, dep_range)
+                self.versions.setdefault(lowered, {}).setdefault(target, version)
+
+    def get(self, pkg_id: str) -> Optional[Dict]:
+        return self.packages.get(pkg_id.lower())
+
+    def dependency_graph(self) -> Dict[str, List[str]]:
+        """Adjacency lists between lowercased ids, built once and reused by ``closure``."""
+        if self._graph is None:
+            self._graph = {
+                lowered: [dep.lower() for dep in entry["dependencies"] if dep.lower() in self.packages]
+                for lowered, entry in self.packages.items()
+            }
+        return self._graph
+
+    def closure(self, roots: Iterable[str]) -> List[str]:
+        """``roots`` followed by every package they transitively depend on.
+
+        Project references in the target are walked as extra roots, since their
+        package dependencies ship too, but are not returned themselves. The
+        walk shares one visited set across all roots, so each node is expanded
+        once however many paths lead to it.
+        """
+        graph = self.dependency_graph()
+        result: List[str] = []
+        visited = set()
+        queue: List[str] = []
+        for pkg in roots:
+            if pkg.lower() not in visited:
+                visited.add(pkg.lower())
+                result.append(pkg)
+                queue.append(pkg.lower())
+        for lowered, entry in self.packages.items():
+            if entry["type"] == "project" and lowered not in visited:
+                visited.add(lowered)
+                queue.append(lowered)
+        for lowered in queue:
+            for dep in graph.get(lowered, []):
+                if dep in visited:
+                    continue
+                visited.add(dep)
+                queue.append(dep)
+                if self.packages[dep]["type"] != "project":
+                    result.append(self.packages[dep]["id"])
+        return result
+
+    def version_differences(self) -> Dict[str, Dict[str, str]]:
+        """Packages resolved to different versions across targets, as ``{id: {target: version}}``."""
+        return {
+            self.packages[lowered]["id"]: per_target
+            for lowered, per_target in sorted(self.versions.items())
+            if len(set(per_target.values())) > 1
+        }
+
+
+def resolve_packages(
+    packages: Iterable[str], central_versions: Dict[str, str], assets: Union[Dict, AssetsIndex]
+) -> Dict[str, Dict]:
+    index = assets if isinstance(assets, AssetsIndex) else AssetsIndex(assets)
     resolved: Dict[str, Dict] = {}
     for pkg in packages:
-        version = None
-        for key in targets.keys():
-            if key.lower().startswith(pkg.lower() + "/"):
-                version = key.split("/", 1)[1]
-                break
+        entry = index.get(pkg)
+        version = entry["version"] if entry else None
         if version is None:
             version = central_versions.get(pkg)
         package_path = None
-        if version and pkg_folders:
-            package_path = Path(pkg_folders[0]) / pkg.lower() / version.lower()
+        if version and index.package_folders:
+            package_path = Path(index.package_folders[0]) / pkg.lower() / version.lower()
         resolved[pkg] = {"version": version, "package_path": package_path}
     return resolved
 
 
+_SLN_PROJECT = re.compile(r'^Project\("\{[^}]+\}"\)\s*=\s*"[^"]*",\s*"([^"]+\.(?:cs|fs|vb)proj)"', re.M)
+
+
+def load_solution_projects(sln_path: Path, include_tests: bool = False) -> List[Path]:
+    """Project files listed in a Visual Studio solution that exist on disk (e.g. skipping absent submodules).
+
+    Test projects are skipped unless ``include_tests``: their packages do not
+    ship and need no notices.
+    """
+    if not sln_path.exists():
+        return []
+    projects: List[Path] = []
+    for rel in _SLN_PROJECT.findall(sln_path.read_text(encoding="utf-8-sig", errors="replace")):
+        path = (sln_path.parent / rel.replace("\\", "/")).resolve()
+        if path.is_file() and path not in projects and (include_tests or not is_test_project(path)):
+            projects.append(path)
+    return projects
+
+
+def _version_key(version: str) -> Tuple:
+    release, _, prerelease = version.partition("-")
+    parts = tuple(int(p) if p.isdigit() else 0 for p in release.split("."))
+    # A release sorts after its prereleases.
+    return parts, not prerelease, prerelease
+
+
+def resolve_solution_packages(
+    sln_path: Path, all_targets: bool = False, jobs: int = 8, transitive: bool = False
+) -> Tuple[List[str], Dict[str, Dict]]:
+    """Resolve the PackageReferences of every project in a solution into one package set.
+
+    Projects are read in parallel; each uses its own props files and
+    ``obj/project.assets.json``. Packages referenced by several projects appear
+    once, at the highest resolved version, with ``projects`` listing the
+    referencing project files, ``versions`` the version each resolved to and
+    ``package_paths`` the package folder of every distinct version (see
+    ``package_versions``).
+    With ``transitive`` each project contributes its full dependency closure.
+    """
+    projects = load_solution_projects(sln_path)
+
+    def scan(project: Path) -> Tuple[Path, List[str], Dict[str, Dict]]:
+        direct = load_direct_packages(project)
+        if not direct:
+            return project, [], {}
+        # A version on the PackageReference itself wins over the central one.
+        central_versions = {**load_central_versions(project_path=project), **load_inline_versions(project)}
+        index = AssetsIndex(load_assets(project.parent / "obj" / "project.assets.json"), all_targets)
+        if transitive:
+            direct = index.closure(direct)
+        return project, direct, resolve_packages(direct, central_versions, index)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(projects) or 1))) as pool:
+        results = list(pool.map(scan, projects))
+
+    packages: List[str] = []
+    merged: Dict[str, Dict] = {}
+    for project, direct, resolved in results:
+        for pkg in direct:
+            info = resolved[pkg]
+            entry = merged.get(pkg)
+            if entry is None:
+                packages.append(pkg)
+                entry = merged[pkg] = {
+                    "version": None,
+                    "package_path": None,
+                    "projects": [],
+                    "versions": {},
+                    "package_paths": {},
+                }
+            entry["projects"].append(str(project))
+            version = info.get("version")
+            if not version:
+                continue
+            entry["versions"][str(project)] = version
+            entry["package_paths"].setdefault(version, info.get("package_path"))
+            if entry["version"] is None or _version_key(version) > _version_key(entry["version"]):
+                entry["version"], entry["package_path"] = version, info.get("package_path")
+    return packages, merged
+
+
+def package_versions(info: Dict) -> List[Tuple[str, Optional[Path]]]:
+    """``(version, package_path)`` of every distinct resolved version of a package, highest first."""
+    paths = info.get("package_paths") or ({info["version"]: info.get("package_path")} if info.get("version") else {})
+    return sorted(paths.items(), key=lambda item: _version_key(item[0]), reverse=True)
+
+
 def load_families_config(path: Path = FAMILIES_CFG) -> Tuple[Dict, Dict[str, str]]:
     data = {"version": "1.0", "families": []}
     package_to_family: Dict[str, str] = {}
@@ -186,33 +690,34 @@ def choose_family(pkg_id: str, repo_owner: Optional[str], package_to_family: Dic
     return pkg_id
 
 
-def pick_canonical_license(texts: List[str], org_entry: Optional[Dict] = None) -> Tuple[str, Dict]:
-    """Pick a canonical license text from a list, considering org-specific aliases."""
+def pick_canonical_license(hashes: List[str], texts: Dict[str, str], org_entry: Optional[Dict] = None) -> Tuple[str, Dict]:
+    """Pick a canonical license hash from a list, considering org-specific aliases.
+
+    ``hashes`` are ``license_hash`` values and ``texts`` maps them back to the
+    license text. Returns the chosen hash and, when the family has more than
+    one variant, a ``{hash: count}`` warning.
+    """
     aliases = set()
     if org_entry:
         for alias in org_entry.get("license_aliases", []) or []:
-            aliases.add(license_signature(alias))
+            aliases.add(license_hash(alias))
 
-    sig_map: Dict[str, Dict] = {}
-    for txt in texts:
-        sig = license_signature(txt or "")
-        sig_map.setdefault(sig, {"text": txt or "", "count": 0, "alias": sig in aliases})
-        sig_map[sig]["count"] += 1
+    counts: Dict[str, int] = {}
+    for digest in hashes:
+        counts[digest] = counts.get(digest, 0) + 1
     # warning if more than one signature
     warning = {}
-    if len(sig_map) > 1:
-        warning = {k: v["count"] for k, v in sig_map.items()}
-
-    def score(item: Tuple[str, Dict]) -> Tuple[int, int, int, int]:
-        sig, meta = item
-        text = meta["text"]
-        alias_bonus = 1 if meta.get("alias") else 0
-        has_copyright = 1 if ("copyright" in text.lower()) else 0
+    if len(counts) > 1:
+        warning = dict(counts)
+
+    def score(digest: str) -> Tuple[int, int, int, int]:
+        text = texts.get(digest) or ""
+        alias_bonus = 1 if digest in aliases else 0
+        has_copyright = 1 if "copyright" in normalize_license(text).signature else 0
         length = len(text)
-        return (alias_bonus, meta["count"], has_copyright, length)
+        return (alias_bonus, counts[digest], has_copyright, length)
 
-    canonical_sig, canonical_meta = max(sig_map.items(), key=score)
-    return canonical_meta["text"], warning
+    return max(counts, key=score), warning
 
 
 def family_for_package(pkg_id: str, package_to_family: Dict[str, str] | None = None) -> str:
@@ -232,48 +737,125 @@ def looks_like_html(text: str) -> bool:
     return "<html" in sample or sample.startswith("<!doctype") or "<body" in sample
 
 
-def clean_license_text(text: str) -> str:
-    if not text:
-        return ""
+PLACEHOLDER_MARKERS = frozenset(
+    ["<year>", "<copyright", "<copyright holders>", "{year}", "yyyy", "replaceable-license-text"]
+)
+SPDX_TEMPLATE_MARKERS = frozenset(
+    ["spdx identifier", "data pulled from spdx", "replaceable-license-text", "licenses.nuget.org"]
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+# Runs of blanks and of 3+ newlines never overlap, so both collapse in one scan.
+_LAYOUT_RE = re.compile(r"[ \t]+|\n{3,}")
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_RE = re.compile("|".join(re.escape(m) for m in sorted(PLACEHOLDER_MARKERS, key=len, reverse=True)))
+_SPDX_TEMPLATE_RE = re.compile("|".join(re.escape(m) for m in sorted(SPDX_TEMPLATE_MARKERS, key=len, reverse=True)))
+_MARKER_RE = re.compile(
+    "|".join(re.escape(m) for m in sorted(PLACEHOLDER_MARKERS | SPDX_TEMPLATE_MARKERS, key=len, reverse=True))
+)
+
+
+class NormalizedLicense(NamedTuple):
+    cleaned: str
+    signature: str
+    hash: str
+    has_placeholders: bool
+    is_spdx_template: bool
+
+
+_normalized: Dict[bytes, NormalizedLicense] = {}
+
+
+def normalize_license(text: Optional[str]) -> NormalizedLicense:
+    """Clean ``text`` and derive its signature, hash and marker flags, memoized by raw-text hash.
+
+    The flags are those of ``has_placeholders`` / ``is_spdx_template`` applied
+    to the cleaned text; all markers are found in a single scan of it.
+    """
+    text = text or ""
+    key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+    cached = _normalized.get(key)
+    if cached is not None:
+        return cached
+
     normalized = text.replace("\r\n", "\n")
     if looks_like_html(normalized):
-        normalized = re.sub(r"<[^>]+>", " ", normalized)
-    normalized = html.unescape(normalized)
-    normalized = re.sub(r"[ \t]+", " ", normalized)
-    normalized = re.sub(r"\n{3,}", "\n\n", normalized)
-    return normalized.strip()
+        normalized = _TAG_RE.sub(" ", normalized)
+    if "&" in normalized:
+        import html
+
+        normalized = html.unescape(normalized)
+    cleaned = _LAYOUT_RE.sub(lambda m: "\n\n" if m.group(0)[0] == "\n" else " ", normalized).strip()
+    low = cleaned.lower()
+    signature = _WHITESPACE_RE.sub(" ", low)
+    markers = set(_MARKER_RE.findall(low))
+    result = NormalizedLicense(
+        cleaned=cleaned,
+        signature=signature,
+        hash=hashlib.sha256(signature.encode("utf-8")).hexdigest(),
+        has_placeholders=not markers.isdisjoint(PLACEHOLDER_MARKERS),
+        is_spdx_template=not markers.isdisjoint(SPDX_TEMPLATE_MARKERS),
+    )
+    _normalized[key] = result
+    return result
+
+
+def clean_license_text(text: str) -> str:
+    return normalize_license(text).cleaned
 
 
 def license_signature(text: str) -> str:
-    return re.sub(r"\s+", " ", clean_license_text(text).strip().lower())
+    return normalize_license(text).signature
+
+
+def license_hash(text: str) -> str:
+    """Content address of a license: the SHA-256 of its signature."""
+    return normalize_license(text).hash
 
 
 def has_placeholders(text: str) -> bool:
-    if not text:
-        return False
-    low = text.lower()
-    placeholders = [
-        "<year>",
-        "<copyright",
-        "<copyright holders>",
-        "{year}",
-        "yyyy",
-        "replaceable-license-text",
-    ]
-    return any(p in low for p in placeholders)
+    return bool(text) and _PLACEHOLDER_RE.search(text.lower()) is not None
 
 
 def is_spdx_template(text: str) -> bool:
-    if not text:
-        return False
-    low = text.lower()
-    markers = [
-        "spdx identifier",
-        "data pulled from spdx",
-        "replaceable-license-text",
-        "licenses.nuget.org",
-    ]
-    return any(m in low for m in markers)
+    return bool(text) and _SPDX_TEMPLATE_RE.search(text.lower()) is not None
+
+
+def write_text_if_changed(path: Path, text: str) -> bool:
+    """Write ``text`` to ``path`` only if its content differs; return whether it was written.
+
+    The new content goes to a temporary file in the same directory that is
+    then renamed over ``path``, so an interrupted run never leaves a
+    half-written file and an unchanged file keeps its mtime.
+    """
+    new_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if path.exists():
+        try:
+            current = path.read_text(encoding="utf-8")
+            if hashlib.sha256(current.encode("utf-8")).hexdigest() == new_hash:
+                return False
+        except (OSError, UnicodeDecodeError):
+            pass
+    import tempfile
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except OSError:
+        # New file: the mode open() would have given it.
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        # mkstemp creates 0600 files; keep the permissions of the file being replaced.
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return True
 
 
 def indent_block(text: str, prefix: str = "    ") -> str:
@@ -284,7 +866,11 @@ def indent_block(text: str, prefix: str = "    ") -> str:
 def read_sections(path: Path = NOTICES) -> Tuple[str, Dict[str, str]]:
     if not path.exists():
         return "", {}
-    text = path.read_text(encoding="utf-8")
+    return split_sections(path.read_text(encoding="utf-8"))
+
+
+def split_sections(text: str) -> Tuple[str, Dict[str, str]]:
+    """Split rendered notices ``text`` into its preamble and ``{title: body}`` sections."""
     lines = text.splitlines()
     header_re = re.compile(r"^##\s+(.*)")
     preamble_lines: List[str] = []
@@ -307,3 +893,109 @@ def read_sections(path: Path = NOTICES) -> Tuple[str, Dict[str, str]]:
     preamble = "\n".join(preamble_lines).strip()
     preamble = preamble + "\n" if preamble else ""
     return preamble, sections
+
+
+def splice_sections(text: str, updates: Dict[str, str]) -> str:
+    """Replace or insert the bodies of ``updates`` in a rendered notices ``text``.
+
+    Every byte outside the updated sections is kept as is. Sections not yet
+    present are inserted before the first existing title that sorts after
+    them (case-insensitively), or appended at the end.
+    """
+    headers = list(re.finditer(r"^##[ \t]+(.*)$", text, re.M))
+    pending = dict(updates)
+    if headers:
+        out: List[str] = [text[: headers[0].start()]]
+    else:
+        out = [text.rstrip() + "\n\n" if text.strip() else ""]
+
+    def render(name: str, body: str) -> str:
+        return f"## {name}\n\n{body.rstrip()}\n\n"
+
+    for i, header in enumerate(headers):
+        title = header.group(1).strip()
+        for name in sorted([n for n in pending if n.lower() < title.lower()], key=str.lower):
+            out.append(render(name, pending.pop(name)))
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        if title in pending:
+            out.append(render(title, pending.pop(title)))
+        else:
+            out.append(text[header.start():end])
+    if pending and out[-1].strip():
+        # The last kept section ends at the end of the file, usually without its blank line.
+        out[-1] = out[-1].rstrip() + "\n\n"
+    for name in sorted(pending, key=str.lower):
+        out.append(render(name, pending[name]))
+    return "".join(out).rstrip() + "\n"
+
+
+def section_hash(body: str) -> str:
+    """Content hash of a section body, normalized the way ``read_sections`` returns it."""
+    normalized = "\n".join(body.splitlines()).strip("\n") + "\n"
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def index_notices(data: bytes) -> Dict:
+    """Byte offset, length and body hash of the preamble and every ``## `` section in ``data``."""
+    headers = list(re.finditer(rb"^##[ \t]+(.*?)\r?$", data, re.M))
+    preamble_end = headers[0].start() if headers else len(data)
+    index: Dict = {
+        "preamble": {"offset": 0, "length": preamble_end},
+        "sections": {},
+    }
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(data)
+        body = data[header.end():end].decode("utf-8")
+        index["sections"][header.group(1).decode("utf-8").strip()] = {
+            "offset": header.start(),
+            "length": end - header.start(),
+            "hash": section_hash(body),
+        }
+    return index
+
+
+def _load_index_store(index_path: Path) -> Dict[str, Dict]:
+    try:
+        return json.loads(index_path.read_text(encoding="utf-8")).get("files", {})
+    except Exception:
+        return {}
+
+
+def update_notices_index(path: Path = NOTICES, index_path: Path = NOTICES_INDEX) -> Dict:
+    """Re-index ``path`` as it is on disk and store the result in the sidecar index."""
+    if not path.exists():
+        return index_notices(b"")
+    stat = path.stat()
+    index = index_notices(path.read_bytes())
+    index.update({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+    store = _load_index_store(index_path)
+    store[str(path.resolve())] = index
+    try:
+        write_text_if_changed(index_path, json.dumps({"version": 1, "files": store}, indent=2))
+    except OSError:
+        pass
+    return index
+
+
+def load_notices_index(path: Path = NOTICES, index_path: Path = NOTICES_INDEX) -> Dict:
+    """Section index of ``path`` from the sidecar, rebuilt when the file changed since it was indexed."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return index_notices(b"")
+    index = _load_index_store(index_path).get(str(path.resolve()))
+    if index and index.get("size") == stat.st_size and index.get("mtime_ns") == stat.st_mtime_ns:
+        return index
+    return update_notices_index(path, index_path)
+
+
+def read_section(path: Path, title: str, index: Optional[Dict] = None) -> Optional[str]:
+    """Read one section body of ``path`` by seeking to its indexed offset."""
+    entry = (index or load_notices_index(path))["sections"].get(title)
+    if entry is None:
+        return None
+    with path.open("rb") as fh:
+        fh.seek(entry["offset"])
+        raw = fh.read(entry["length"]).decode("utf-8")
+    body = raw.split("\n", 1)[1] if "\n" in raw else ""
+    return "\n".join(body.splitlines()).strip("\n") + "\n"
@@ -6,7 +6,27 @@ Requirements:
 - ImageMagick `magick` CLI available on PATH (used for both .ico and .icns)
 
 Usage (from repo root):
-  python ProjectRover/tools/update_icons.py --png ProjectRover/image.png
+  python ProjectRover/tools/update_icons.py --png ProjectRover/image.png [--jobs N]
+
+Every output is an independent `magick` call; they run N at a time (default:
+CPU count). Failures are collected and reported at the end instead of
+stopping the run.
+
+Existing PNGs are replaced only where tools/icon_targets.json includes them;
+git-ignored directories, submodules and build output (bin/, obj/, ...) are
+never walked.
+
+Outputs whose source, ImageMagick version and parameters match the last run
+(recorded in .cache/icon_manifest.json) and that were not modified since are
+skipped; --force regenerates everything. Files regenerated with identical
+bytes keep their mtime.
+
+With --batch, all plain resizes (PNG asset, iconset, replaced PNGs) are
+written by a single `magick` call that decodes the source once and resizes
+each output from a halving pyramid of it. The batched PNGs are written to a
+staging directory and compared with the one-call-per-output results first;
+they replace the real outputs only if every one passes --min-psnr
+(--no-verify-batch skips the comparison).
 
 Defaults:
 - Source PNG: ProjectRover/image.png
@@ -15,45 +35,110 @@ Defaults:
 """
 
 import argparse
+import hashlib
+import json
+import os
+import re
 import shutil
+import struct
 import subprocess
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# A pyramid level is only used for outputs at least this many times smaller, so
+# every output is still downsampled at least 2x, as when resizing the source.
+PYRAMID_MARGIN = 2
+
+# Never descended into when looking for PNGs to replace: VCS data, caches and build/publish output.
+PRUNED_DIRS = {".git", ".vs", ".cache", "bin", "obj", "node_modules", "publish", "artifacts"}
+TARGETS_MANIFEST = Path(__file__).resolve().with_name("icon_targets.json")
+# Bump when the commands generating outputs change, so every output is regenerated once.
+MANIFEST_VERSION = 1
+
+
+class MagickError(Exception):
+    pass
+
+
+class Job(NamedTuple):
+    """One `magick` invocation producing ``outputs``; ``label`` is used in progress messages.
+
+    ``resize`` is set for plain ``src -resize WxH out`` jobs, which --batch merges.
+    """
+
+    label: str
+    outputs: List[Path]
+    args: List[str]
+    resize: Optional[Tuple[int, int]] = None
+
+
+def resize_job(label: str, src: Path, dest: Path, w: int, h: int) -> Job:
+    return Job(label, [dest], [str(src), "-resize", f"{w}x{h}", str(dest)], (w, h))
 
 
 def run_magick(args: list[str]):
     cmd = ["magick"] + args
     try:
-        subprocess.run(cmd, check=True)
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
     except FileNotFoundError:
-        sys.exit("magick not found. Install ImageMagick and ensure `magick` is on PATH.")
+        raise MagickError("magick not found. Install ImageMagick and ensure `magick` is on PATH.")
     except subprocess.CalledProcessError as e:
-        sys.exit(f"magick command failed: {' '.join(cmd)} -> {e}")
+        detail = (e.stderr or "").strip()
+        raise MagickError(f"magick command failed: {' '.join(cmd)} -> {e}" + (f"\n{detail}" if detail else ""))
+
+
+def run_jobs(jobs: List[Job], max_workers: int) -> Tuple[List[Tuple[Job, float]], List[Tuple[Job, str]]]:
+    """Run ``jobs`` at most ``max_workers`` at a time; return ``(done, failed)``.
+
+    Each job is its own `magick` process, so threads are enough to keep that
+    many processes busy. Failures are collected rather than aborting the run.
+    """
+    done: List[Tuple[Job, float]] = []
+    failed: List[Tuple[Job, str]] = []
 
+    def work(job: Job) -> float:
+        start = time.perf_counter()
+        for output in job.outputs:
+            output.parent.mkdir(parents=True, exist_ok=True)
+        run_magick(job.args)
+        return time.perf_counter() - start
 
-def make_ico(src: Path, dest: Path):
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    run_magick([str(src), "-define", "icon:auto-resize=256,128,64,48,32,24,16", str(dest)])
-    print(f"[ok] wrote ICO: {dest}")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(work, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                elapsed = future.result()
+            except MagickError as e:
+                failed.append((job, str(e)))
+                print(f"[error] {job.label}: {', '.join(map(str, job.outputs))}: {e}")
+                continue
+            done.append((job, elapsed))
+            for output in job.outputs:
+                print(f"[ok] wrote {job.label}: {output} ({elapsed:.2f}s)")
+    return done, failed
 
 
-def make_icns(src: Path, dest: Path):
-    dest.parent.mkdir(parents=True, exist_ok=True)
+def make_ico(src: Path, dest: Path) -> List[Job]:
+    return [Job("ICO", [dest], [str(src), "-define", "icon:auto-resize=256,128,64,48,32,24,16", str(dest)])]
+
+
+def make_icns(src: Path, dest: Path) -> List[Job]:
     # Resize to 1024 and let ImageMagick generate all standard sizes
-    run_magick([str(src), "-resize", "1024x1024", "-define", "icns:auto-resize=16,32,64,128,256,512,1024", str(dest)])
-    print(f"[ok] wrote ICNS: {dest}")
+    args = [str(src), "-resize", "1024x1024", "-define", "icns:auto-resize=16,32,64,128,256,512,1024", str(dest)]
+    return [Job("ICNS", [dest], args)]
 
 
-def make_png_asset(src: Path, dest: Path, size: int = 256):
-    dest.parent.mkdir(parents=True, exist_ok=True)
+def make_png_asset(src: Path, dest: Path, size: int = 256) -> List[Job]:
     # Resize source to a square PNG for app assets (default 256x256)
-    run_magick([str(src), "-resize", f"{size}x{size}", str(dest)])
-    print(f"[ok] wrote PNG asset: {dest} ({size}x{size})")
+    return [resize_job(f"PNG asset ({size}x{size})", src, dest, size, size)]
 
 
-def make_iconset(src: Path, dest_dir: Path):
-    dest_dir.mkdir(parents=True, exist_ok=True)
+def make_iconset(src: Path, dest_dir: Path) -> List[Job]:
     # Standard macOS iconset sizes (with @2x variants). Filenames follow the iconset convention.
     sizes = [
         ("icon_16x16.png", 16),
@@ -68,10 +153,86 @@ def make_iconset(src: Path, dest_dir: Path):
         ("icon_512x512@2x.png", 1024),
     ]
 
-    for name, px in sizes:
-        out = dest_dir / name
-        run_magick([str(src), "-resize", f"{px}x{px}", str(out)])
-        print(f"[ok] wrote iconset PNG: {out}")
+    return [resize_job("iconset PNG", src, dest_dir / name, px, px) for name, px in sizes]
+
+
+def pyramid_level(src_size: Tuple[int, int], size: Tuple[int, int]) -> int:
+    """Smallest halving of ``src_size`` that is still PYRAMID_MARGIN times ``size``."""
+    level = 0
+    while all((s >> (level + 1)) >= PYRAMID_MARGIN * t for s, t in zip(src_size, size)):
+        level += 1
+    return level
+
+
+def batch_resizes(src: Path, jobs: List[Job], src_size: Tuple[int, int], staging: Optional[Path] = None) -> Job:
+    """Merge plain resize ``jobs`` into one `magick` call that decodes ``src`` once.
+
+    The decoded source and its halvings are kept as in-memory `mpr:` images;
+    each output is resized from the smallest level that is at least
+    PYRAMID_MARGIN times its size. With ``staging``, the outputs are written
+    there instead (in the same order), to be verified before they are moved
+    into place.
+    """
+    sw, sh = src_size
+    levels = [pyramid_level(src_size, job.resize) for job in jobs]
+    args = [str(src), "-write", "mpr:level0", "+delete"]
+    for level in range(1, max(levels, default=0) + 1):
+        args += [f"mpr:level{level - 1}", "-resize", f"{sw >> level}x{sh >> level}", "-write", f"mpr:level{level}", "+delete"]
+    outputs: List[Path] = []
+    for job, level in zip(jobs, levels):
+        w, h = job.resize
+        for output in job.outputs:
+            if staging is not None:
+                output = staging / f"{len(outputs)}-{output.name}"
+            outputs.append(output)
+            args += [f"mpr:level{level}", "-resize", f"{w}x{h}", "-write", str(output), "+delete"]
+    args.append("null:")
+    return Job("batched PNG" if staging is None else "batched PNG (staged)", outputs, args)
+
+
+def psnr(a: Path, b: Path) -> float:
+    """PSNR of ``a`` against ``b`` in dB (``inf`` when identical), from `magick compare`."""
+    proc = subprocess.run(
+        ["magick", "compare", "-metric", "PSNR", str(a), str(b), "null:"], capture_output=True, text=True
+    )
+    # compare exits 1 when the images merely differ; 2 is a real error.
+    if proc.returncode > 1:
+        raise MagickError(f"magick compare failed for {a}: {proc.stderr.strip()}")
+    value = proc.stderr.strip().split()[0] if proc.stderr.strip() else "inf"
+    return float("inf") if value.lower() == "inf" else float(value)
+
+
+def verify_batch(
+    src: Path, jobs: List[Job], min_psnr: float, max_workers: int, names: Optional[Dict[Path, Path]] = None
+) -> List[str]:
+    """Compare batched outputs with one-call-per-output resizes; return the problems found.
+
+    ``names`` maps staged outputs to the paths reported in messages.
+    """
+    names = names or {}
+    problems: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="update_icons_") as tmp:
+
+        def check(item: Tuple[int, Job]) -> Optional[str]:
+            index, job = item
+            output = job.outputs[0]
+            name = names.get(output, output)
+            reference = Path(tmp) / f"{index}.png"
+            run_magick([str(src), "-resize", f"{job.resize[0]}x{job.resize[1]}", str(reference)])
+            if image_size(output) != image_size(reference):
+                return f"{name}: size {image_size(output)} differs from {image_size(reference)}"
+            value = psnr(output, reference)
+            print(f"[verify] {name}: PSNR {value:.1f} dB")
+            if value < min_psnr:
+                return f"{name}: PSNR {value:.1f} dB is below {min_psnr} dB"
+            return None
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            try:
+                problems = [problem for problem in pool.map(check, enumerate(jobs)) if problem]
+            except MagickError as e:
+                problems.append(str(e))
+    return problems
 
 
 def identify_size(path: Path) -> Tuple[int, int]:
@@ -80,18 +241,191 @@ def identify_size(path: Path) -> Tuple[int, int]:
         w, h = out.decode().strip().split()
         return int(w), int(h)
     except FileNotFoundError:
-        sys.exit("magick not found. Install ImageMagick and ensure `magick` is on PATH.")
-    except Exception:
-        raise
+        raise MagickError("magick not found. Install ImageMagick and ensure `magick` is on PATH.")
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_size(path: Path) -> Optional[Tuple[int, int]]:
+    """Width and height from the IHDR chunk, which a valid PNG must start with; None otherwise."""
+    try:
+        with path.open("rb") as fh:
+            head = fh.read(24)
+    except OSError:
+        return None
+    if len(head) < 24 or head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    w, h = struct.unpack(">II", head[16:24])
+    return (w, h) if w and h else None
+
+
+def image_size(path: Path) -> Tuple[int, int]:
+    """Size of ``path``, read from its PNG header; `magick identify` only for anything else."""
+    return png_size(path) or identify_size(path)
+
+
+def glob_regex(pattern: str, anchored: bool = True) -> "re.Pattern[str]":
+    """Translate a gitignore-style glob (``*``, ``?``, ``[...]``, ``**``) to a regex over posix paths."""
+    out = "" if anchored else "(?:.*/)?"
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            out += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            out += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            out += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1 :]:
+            end = pattern.index("]", i + 1)
+            out += "[" + pattern[i + 1 : end].replace("!", "^", 1) + "]"
+            i = end + 1
+        else:
+            out += re.escape(pattern[i])
+            i += 1
+    return re.compile(out + "$")
+
+
+class IgnoreRule(NamedTuple):
+    base: str
+    regex: "re.Pattern[str]"
+    negate: bool
+    dir_only: bool
+
+
+def read_gitignore(path: Path, base: str) -> List[IgnoreRule]:
+    """Rules of one .gitignore; ``base`` is its directory relative to the walk root ("" for the root)."""
+    rules: List[IgnoreRule] = []
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        line = line[1:] if negate else line.lstrip("\\")
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory.
+        anchored = "/" in line
+        rules.append(IgnoreRule(base, glob_regex(line.lstrip("/"), anchored), negate, dir_only))
+    return rules
+
+
+def is_ignored(rel: str, is_dir: bool, rules: List[IgnoreRule]) -> bool:
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.base and not rel.startswith(rule.base + "/"):
+            continue
+        if rule.regex.match(rel[len(rule.base) + 1 :] if rule.base else rel):
+            ignored = not rule.negate
+    return ignored
+
+
+def read_submodules(root: Path) -> set:
+    try:
+        text = (root / ".gitmodules").read_text(encoding="utf-8")
+    except OSError:
+        return set()
+    return {m.strip().strip("/") for m in re.findall(r"^\s*path\s*=\s*(.+)$", text, re.M)}
+
+
+def load_targets(path: Path = TARGETS_MANIFEST) -> Tuple[List[str], List[str]]:
+    """Include/exclude globs (relative to the ProjectRover root) of PNGs replace_pngs may overwrite."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return ["**/*.png"], []
+    return data.get("include") or ["**/*.png"], data.get("exclude") or []
+
 
+def static_prefix(pattern: str) -> str:
+    """Leading directories of ``pattern`` that contain no glob characters."""
+    parts = pattern.split("/")[:-1]
+    prefix: List[str] = []
+    for part in parts:
+        if any(ch in part for ch in "*?["):
+            break
+        prefix.append(part)
+    return "/".join(prefix)
 
-def replace_pngs(src: Path, root: Path, dry_run: bool = False):
+
+def walk_pngs(root: Path, includes: List[str], excludes: List[str], max_workers: int = 8) -> List[Path]:
+    """PNG files under ``root`` matching ``includes`` and not ``excludes``.
+
+    Directories that are git-ignored (nested .gitignore files are honoured),
+    submodules, PRUNED_DIRS and directories no include pattern can reach are
+    never entered. Each level of the tree is listed in parallel.
+    """
+    include_res = [glob_regex(p) for p in includes]
+    exclude_res = [glob_regex(p) for p in excludes]
+    prefixes = [static_prefix(p) for p in includes]
+    submodules = read_submodules(root)
+
+    def reachable(rel: str) -> bool:
+        return any(not p or p == rel or p.startswith(rel + "/") or rel.startswith(p + "/") for p in prefixes)
+
+    def scan(task: Tuple[Path, str, List[IgnoreRule]]) -> Tuple[List[Path], List[Tuple[Path, str, List[IgnoreRule]]]]:
+        directory, rel_dir, rules = task
+        if (directory / ".gitignore").is_file():
+            rules = rules + read_gitignore(directory / ".gitignore", rel_dir)
+        files: List[Path] = []
+        subdirs: List[Tuple[Path, str, List[IgnoreRule]]] = []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return files, subdirs
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if (
+                    entry.name in PRUNED_DIRS
+                    or rel in submodules
+                    or not reachable(rel)
+                    or any(r.match(rel + "/") for r in exclude_res)
+                    or is_ignored(rel, True, rules)
+                ):
+                    continue
+                subdirs.append((Path(entry.path), rel, rules))
+            elif entry.name.lower().endswith(".png") and entry.is_file():
+                if (
+                    any(r.match(rel) for r in include_res)
+                    and not any(r.match(rel) for r in exclude_res)
+                    and not is_ignored(rel, False, rules)
+                ):
+                    files.append(Path(entry.path))
+        return files, subdirs
+
+    found: List[Path] = []
+    pending: List[Tuple[Path, str, List[IgnoreRule]]] = [(root, "", [])]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while pending:
+            next_level: List[Tuple[Path, str, List[IgnoreRule]]] = []
+            for files, subdirs in pool.map(scan, pending):
+                found.extend(files)
+                next_level.extend(subdirs)
+            pending = next_level
+    return sorted(found)
+
+
+def replace_pngs(src: Path, root: Path, dry_run: bool = False, max_workers: int = 8) -> List[Job]:
     src = src.resolve()
-    for p in sorted(root.rglob("*.png")):
+    jobs: List[Job] = []
+    for p in walk_pngs(root, *load_targets(), max_workers=max_workers):
         if p.resolve() == src:
             continue
         try:
-            w, h = identify_size(p)
+            w, h = image_size(p)
         except Exception:
             print(f"[skip] cannot identify size for {p}")
             continue
@@ -99,8 +433,76 @@ def replace_pngs(src: Path, root: Path, dry_run: bool = False):
         if dry_run:
             continue
         # Resize source to match target and overwrite
-        run_magick([str(src), "-resize", f"{w}x{h}", str(p)])
-        print(f"[ok] replaced PNG: {p} ({w}x{h})")
+        jobs.append(resize_job(f"replaced PNG ({w}x{h})", src, p, w, h))
+    return jobs
+
+
+def file_hash(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def magick_version() -> Optional[str]:
+    try:
+        out = subprocess.run(["magick", "-version"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.splitlines()[0].strip() if out else None
+
+
+def job_params(job: Job, output: Path) -> str:
+    """What, besides the source, determines ``output``: the magick options without the file paths."""
+    if job.resize:
+        return f"-resize {job.resize[0]}x{job.resize[1]}"
+    return " ".join(arg for arg in job.args[1:] if arg != str(output))
+
+
+class IconManifest:
+    """Source hash, tool version, parameters and content hash of every output of the last run."""
+
+    def __init__(self, path: Path, root: Path):
+        self.path = path
+        self.root = root
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.entries = data.get("outputs", {}) if data.get("version") == MANIFEST_VERSION else {}
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def key(self, output: Path) -> str:
+        try:
+            return output.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return str(output.resolve())
+
+    def is_current(self, output: Path, inputs: Dict[str, Optional[str]]) -> bool:
+        entry = self.entries.get(self.key(output))
+        if not entry or any(entry.get(name) != value for name, value in inputs.items()):
+            return False
+        return entry.get("output") == file_hash(output)
+
+    def record(self, output: Path, inputs: Dict[str, Optional[str]], digest: Optional[str]) -> None:
+        self.entries[self.key(output)] = dict(inputs, output=digest)
+
+    def forget(self, output: Path) -> None:
+        self.entries.pop(self.key(output), None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": MANIFEST_VERSION, "outputs": dict(sorted(self.entries.items()))}
+        self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+def print_plan(jobs: List[Job], resizes: List[Job]) -> None:
+    """Dry-run report: every output, the size it would be written at, and the magick calls needed."""
+    sizes = {output: job.resize for job in resizes for output in job.outputs}
+    outputs = [(job, output) for job in jobs for output in job.outputs]
+    for job, output in sorted(outputs, key=lambda item: str(item[1])):
+        size = sizes.get(output)
+        print(f"[plan] {output} ({f'{size[0]}x{size[1]}' if size else job.label})")
+    print(f"[plan] {len(outputs)} output(s) from {len(jobs)} magick call(s); nothing written (dry run).")
 
 
 def main():
@@ -113,26 +515,137 @@ def main():
     parser.add_argument("--png", type=Path, default=default_png, help=f"Source PNG (default: {default_png})")
     parser.add_argument("--ico", type=Path, default=default_ico, help=f"Output ICO (default: {default_ico})")
     parser.add_argument("--icns", type=Path, default=default_icns, help=f"Output ICNS (default: {default_icns})")
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1, help="Number of magick processes to run at once (default: CPU count)."
+    )
+    parser.add_argument(
+        "--batch", action="store_true", help="Write all plain PNG resizes from one magick call that decodes the source once."
+    )
+    parser.add_argument(
+        "--no-verify-batch",
+        action="store_true",
+        help="With --batch, move the batched PNGs into place without comparing them with per-call resizes.",
+    )
+    # Verification is the default now; still accepted so existing scripts keep working.
+    parser.add_argument("--verify-batch", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="List every output and its size without running magick to write anything."
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Regenerate every output, even those whose inputs are unchanged."
+    )
+    parser.add_argument(
+        "--min-psnr", type=float, default=40.0, help="Minimum PSNR in dB of batched PNGs (default: 40)."
+    )
     args = parser.parse_args()
 
     if not args.png.exists():
         sys.exit(f"Source PNG not found: {args.png}")
+    if shutil.which("magick") is None and not args.dry_run:
+        sys.exit("magick not found. Install ImageMagick and ensure `magick` is on PATH.")
 
-    make_ico(args.png, args.ico)
-    make_icns(args.png, args.icns)
+    asset_png = repo_root / "ProjectRover" / "src" / "ProjectRover" / "Assets" / "projectrover-logo.png"
+    jobs = make_ico(args.png, args.ico) + make_icns(args.png, args.icns)
     # Also write a standard PNG asset for the app (used in UI/resources)
-    try:
-        asset_png = repo_root / "ProjectRover" / "src" / "ProjectRover" / "Assets" / "projectrover-logo.png"
-        make_png_asset(args.png, asset_png, size=256)
-    except Exception:
-        print(f"[warn] failed to write PNG asset: {asset_png}")
-
-    make_iconset(args.png, repo_root / "ProjectRover" / "build" / "macos" / "RoverIcon.iconset")
+    jobs += make_png_asset(args.png, asset_png, size=256)
+    jobs += make_iconset(args.png, repo_root / "ProjectRover" / "build" / "macos" / "RoverIcon.iconset")
 
     project_root = repo_root / "ProjectRover"
-    replace_pngs(args.png, project_root)
+    # Outputs written above are regenerated once, not again as "found" PNGs.
+    planned = {output.resolve() for job in jobs for output in job.outputs}
+    replaced = replace_pngs(args.png, project_root, max_workers=args.jobs)
+    jobs += [job for job in replaced if job.outputs[0].resolve() not in planned]
+
+    # Skip outputs generated from the same source, tool and parameters that are still as written.
+    manifest = IconManifest(project_root / ".cache" / "icon_manifest.json", project_root)
+    common = {"source": file_hash(args.png), "tool": magick_version()}
+    inputs = {
+        output: dict(common, params=job_params(job, output) + (" (batch)" if args.batch and job.resize else ""))
+        for job in jobs
+        for output in job.outputs
+    }
+    if not args.force:
+        total = len(jobs)
+        jobs = [job for job in jobs if not all(manifest.is_current(o, inputs[o]) for o in job.outputs)]
+        if total - len(jobs):
+            print(f"[skip] {total - len(jobs)} output(s) up to date (use --force to regenerate them)")
+    if not jobs:
+        print("[done] Icons are up to date.")
+        return 0
+    resizes = [job for job in jobs if job.resize]
+    batch: Optional[Job] = None
+    staging: Optional[Path] = None
+    targets: Dict[Path, Path] = {}
+    if args.batch and resizes:
+        if not args.dry_run:
+            # Batched PNGs are staged next to the manifest, on the same filesystem as the outputs.
+            (project_root / ".cache").mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(prefix="icon_batch_", dir=project_root / ".cache"))
+        batch = batch_resizes(args.png, resizes, image_size(args.png), staging)
+        targets = dict(zip(batch.outputs, [output for job in resizes for output in job.outputs]))
+        jobs = [job for job in jobs if not job.resize] + [batch]
+
+    if args.dry_run:
+        print_plan(jobs, resizes)
+        return 0
+
+    previous = {}
+    for job in jobs:
+        for output in job.outputs:
+            if output.exists():
+                previous[output] = (file_hash(output), output.stat())
+    start = time.perf_counter()
+    done, failed = run_jobs(jobs, args.jobs)
+    wall = time.perf_counter() - start
+    busy = sum(elapsed for _, elapsed in done)
+    outputs = sum(len(job.outputs) for job, _ in done)
+    problems: List[str] = []
+    if staging is not None:
+        try:
+            if any(job is batch for job, _ in done):
+                if not args.no_verify_batch:
+                    staged = [job._replace(outputs=[output]) for job, output in zip(resizes, batch.outputs)]
+                    problems = verify_batch(args.png, staged, args.min_psnr, args.jobs, targets)
+                if problems:
+                    done = [(job, elapsed) for job, elapsed in done if job is not batch]
+                else:
+                    for output, target in targets.items():
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        shutil.move(str(output), str(target))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    for job, _ in done:
+        for output in job.outputs:
+            output = targets.get(output, output)
+            digest = file_hash(output)
+            if output in previous and previous[output][0] == digest:
+                # Same bytes as before: keep the old mtime so bundle and resource builds stay up to date.
+                os.utime(output, ns=(previous[output][1].st_atime_ns, previous[output][1].st_mtime_ns))
+            manifest.record(output, inputs[output], digest)
+    for job, _ in failed:
+        for output in job.outputs:
+            manifest.forget(targets.get(output, output))
+    if problems:
+        for output in targets.values():
+            manifest.forget(output)
+    manifest.save()
+    print(f"[time] {outputs} output(s) in {wall:.2f}s using {args.jobs} job(s) ({busy:.2f}s of magick time)")
+    for job, elapsed in sorted(done, key=lambda item: item[1], reverse=True)[:5]:
+        more = f" (+{len(job.outputs) - 1} more)" if len(job.outputs) > 1 else ""
+        print(f"[time] {elapsed:.2f}s {job.label}: {targets.get(job.outputs[0], job.outputs[0])}{more}")
+    if failed:
+        print(f"[error] {len(failed)} job(s) failed:")
+        for job, error in failed:
+            print(f"  - {', '.join(str(targets.get(output, output)) for output in job.outputs)}: {error}")
+        return 1
+    if problems:
+        print(f"[error] {len(problems)} batched output(s) differ from per-call resizes; none were written:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
     print("[done] Icons updated. Rebuild the app/bundle to see changes.")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -4,40 +4,65 @@ from __future__ import annotations
 
 import argparse
 import difflib
+import fnmatch
+import hashlib
+import http.client
 import json
+import mmap
+import os
 import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
 
+from check_third_party import check_notices, family_map, load_check_cache, report, save_check_cache
 from third_party_common import (
     ASSETS,
+    AssetsIndex,
     CS_PROJ,
     FAMILIES_CFG,
+    FINGERPRINT_FILE,
+    HTTP_CACHE,
     LICENSE_CACHE,
     MANUAL_DEPENDENCIES,
     MANUAL_SECTIONS,
+    NEGATIVE_CACHE,
     NOTICES,
-    PROPS,
+    ORG_CFG,
     RUNS_DIR,
+    assets_fingerprint,
     choose_family,
     clean_license_text,
+    evaluate_msbuild_props,
     extract_github_owner,
-    has_placeholders,
     indent_block,
-    is_spdx_template,
-    license_signature,
+    index_notices,
+    license_hash,
     load_assets,
     load_central_versions,
     load_direct_packages,
+    load_inline_versions,
     load_families_config,
+    load_notices_index,
     load_org_config,
+    load_solution_projects,
+    package_versions,
+    normalize_license,
     pick_canonical_license,
     read_sections,
     resolve_packages,
+    resolve_solution_packages,
+    section_hash,
+    splice_sections,
+    split_sections,
+    update_notices_index,
+    write_text_if_changed,
 )
 
 SPDX_RAW = "https://raw.githubusercontent.com/spdx/license-list-data/main/text/"
@@ -230,13 +255,316 @@ LICENSE_FILE_NAMES = [
 ]
 
 
-def http_get_text(url: str, timeout: int = 10) -> Optional[str]:
-    try:
-        req = Request(url, headers={"User-Agent": "third-party-notices"})
-        with urlopen(req, timeout=timeout) as resp:
-            return resp.read().decode("utf-8", errors="replace")
-    except (URLError, HTTPError):
-        return None
+class HttpClient:
+    """Small HTTP(S) client that keeps one connection alive per host and thread.
+
+    Responses carrying an ETag or Last-Modified header are stored under
+    ``cache_dir`` and revalidated with conditional GETs, so unchanged content
+    comes back as a 304 instead of being downloaded again. A stored body's
+    mtime records when it was last used; ``prune`` evicts by that. Every request is
+    recorded in ``trace`` with its status and latency.
+
+    Like ``urlopen``, it honours the ``HTTP(S)_PROXY`` and ``NO_PROXY``
+    environment variables: HTTPS is tunnelled through the proxy with CONNECT,
+    plain HTTP requests are sent to the proxy with absolute URLs.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = HTTP_CACHE, timeout: int = 10, max_redirects: int = 5):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.trace: List[Dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all_connections: List[http.client.HTTPConnection] = []
+        self.proxies = getproxies()
+
+    def _proxy(self, scheme: str, host: str) -> Tuple[Optional[str], Dict[str, str]]:
+        """Proxy ``host:port`` to use for ``host`` (None when direct) and its auth headers."""
+        proxy = self.proxies.get(scheme)
+        if not proxy or proxy_bypass(urlsplit(f"//{host}").hostname or host):
+            return None, {}
+        parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        headers: Dict[str, str] = {}
+        if parts.username is not None:
+            import base64
+
+            credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+            headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+        return f"{parts.hostname}:{parts.port or 80}", headers
+
+    def _connection(self, scheme: str, host: str) -> Tuple[http.client.HTTPConnection, bool]:
+        conns = getattr(self._local, "connections", None)
+        if conns is None:
+            conns = self._local.connections = {}
+        conn = conns.get((scheme, host))
+        if conn is not None:
+            return conn, True
+        proxy, proxy_headers = self._proxy(scheme, host)
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(proxy or host, timeout=self.timeout)
+            if proxy:
+                conn.set_tunnel(host, headers=proxy_headers)
+        else:
+            conn = http.client.HTTPConnection(proxy or host, timeout=self.timeout)
+        conns[(scheme, host)] = conn
+        with self._lock:
+            self._all_connections.append(conn)
+        return conn, False
+
+    def _drop(self, scheme: str, host: str) -> None:
+        conns = getattr(self._local, "connections", None) or {}
+        conn = conns.pop((scheme, host), None)
+        if conn is not None:
+            conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all_connections:
+                conn.close()
+            self._all_connections.clear()
+
+    def _cache_paths(self, url: str) -> Tuple[Optional[Path], Optional[Path]]:
+        if not self.cache_dir:
+            return None, None
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.body", self.cache_dir / f"{key}.json"
+
+    def _load_cached(self, url: str) -> Tuple[Optional[bytes], Dict]:
+        body_path, meta_path = self._cache_paths(url)
+        if not body_path or not body_path.exists() or not meta_path.exists():
+            return None, {}
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+            os.utime(body_path)
+            return body, meta
+        except Exception:
+            return None, {}
+
+    def _cached_responses(self) -> Dict[str, Dict]:
+        """Stored responses by cache key, with their files, size and last use."""
+        responses: Dict[str, Dict] = {}
+        if not self.cache_dir or not self.cache_dir.is_dir():
+            return responses
+        for path in self.cache_dir.iterdir():
+            if path.suffix not in (".body", ".json"):
+                continue
+            stat = path.stat()
+            entry = responses.setdefault(path.stem, {"files": [], "bytes": 0, "last_used": 0.0})
+            entry["files"].append(path)
+            entry["bytes"] += stat.st_size
+            if path.suffix == ".body":
+                entry["last_used"] = stat.st_mtime
+        return responses
+
+    def stats(self) -> Dict:
+        responses = self._cached_responses()
+        stamps = [e["last_used"] for e in responses.values() if e["last_used"]]
+        return {
+            "directory": str(self.cache_dir),
+            "responses": len(responses),
+            "bytes": sum(e["bytes"] for e in responses.values()),
+            "oldest_use": min(stamps) if stamps else None,
+            "newest_use": max(stamps) if stamps else None,
+        }
+
+    def prune(self, max_bytes: Optional[int] = None, max_age_days: Optional[float] = None) -> int:
+        """Evict incomplete and least recently used responses; return how many were evicted."""
+        with self._lock:
+            responses = self._cached_responses()
+            total = sum(e["bytes"] for e in responses.values())
+            now = time.time()
+            evicted = 0
+            for entry in sorted(responses.values(), key=lambda e: e["last_used"]):
+                incomplete = len(entry["files"]) < 2
+                too_old = max_age_days is not None and now - entry["last_used"] > max_age_days * 86400
+                too_big = max_bytes is not None and total > max_bytes
+                if not (incomplete or too_old or too_big):
+                    continue
+                for path in entry["files"]:
+                    path.unlink(missing_ok=True)
+                total -= entry["bytes"]
+                evicted += 1
+        return evicted
+
+    def _store(self, url: str, body: bytes, headers: Dict[str, str]) -> bool:
+        meta = {k: headers[k] for k in ("etag", "last-modified") if headers.get(k)}
+        body_path, meta_path = self._cache_paths(url)
+        if not meta or not body_path:
+            return False
+        try:
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            body_path.write_bytes(body)
+            meta["url"] = url
+            meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+            return True
+        except OSError:
+            return False
+
+    def _send(self, url: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes, bool]:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        if parts.scheme == "http":
+            proxy, proxy_headers = self._proxy(parts.scheme, parts.netloc)
+            if proxy:
+                # Plain HTTP goes to the proxy itself, which needs the absolute URL.
+                path = f"http://{parts.netloc}{path}"
+                headers = {**headers, **proxy_headers}
+        for attempt in range(2):
+            conn, reused = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # The server closed an idle keep-alive connection; retry once on a fresh one.
+                self._drop(parts.scheme, parts.netloc)
+                if attempt or not reused:
+                    raise
+                continue
+            except Exception:
+                self._drop(parts.scheme, parts.netloc)
+                raise
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            if resp_headers.get("connection", "").lower() == "close":
+                self._drop(parts.scheme, parts.netloc)
+            return resp.status, resp_headers, body, reused
+        raise http.client.HTTPException("unreachable")
+
+    def get(self, url: str) -> Tuple[Optional[str], Dict]:
+        """Fetch ``url`` and return ``(text, record)``; text is None on any failure."""
+        cached_body, cached_meta = self._load_cached(url)
+        headers = {"User-Agent": "third-party-notices", "Connection": "keep-alive"}
+        if cached_body is not None:
+            if cached_meta.get("etag"):
+                headers["If-None-Match"] = cached_meta["etag"]
+            if cached_meta.get("last-modified"):
+                headers["If-Modified-Since"] = cached_meta["last-modified"]
+        record: Dict = {"url": url, "status": None, "cache": "miss", "reused_connection": False}
+        text: Optional[str] = None
+        start = time.perf_counter()
+        try:
+            target = url
+            for _ in range(self.max_redirects + 1):
+                status, resp_headers, body, reused = self._send(target, headers)
+                record["reused_connection"] = record["reused_connection"] or reused
+                if status in (301, 302, 303, 307, 308) and resp_headers.get("location"):
+                    target = urljoin(target, resp_headers["location"])
+                    continue
+                break
+            record["status"] = status
+            if status == 304 and cached_body is not None:
+                record["cache"] = "revalidated"
+                text = cached_body.decode("utf-8", errors="replace")
+            elif 200 <= status < 300:
+                if self._store(url, body, resp_headers):
+                    record["cache"] = "stored"
+                text = body.decode("utf-8", errors="replace")
+        except (OSError, http.client.HTTPException) as exc:
+            record["error"] = type(exc).__name__
+        record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        with self._lock:
+            self.trace.append(record)
+        return text, record
+
+
+HTTP_CLIENT = HttpClient()
+
+
+def http_get_text(url: str) -> Optional[str]:
+    return HTTP_CLIENT.get(url)[0]
+
+
+class NegativeCache:
+    """Remembers license URLs that failed for a package version.
+
+    Entries are keyed by package, version and URL and expire after ``ttl_hours``.
+    While an entry is fresh the URL is not requested again, and the latency the
+    failed request cost is counted towards ``saved_seconds``. With ``enabled``
+    false every URL is retried, but failures are still recorded.
+
+    Only HTTP error responses and timeouts are remembered. Connection-level
+    failures (DNS, refused connections, proxy errors) say nothing about the
+    URL and would block every lookup after an offline run, so they are not.
+    """
+
+    def __init__(self, path: Optional[Path] = NEGATIVE_CACHE, ttl_hours: float = 24.0, enabled: bool = True):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.enabled = enabled
+        self.hits = 0
+        self.saved_seconds = 0.0
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8")).get("entries", {})
+            except Exception:
+                self.entries = {}
+
+    @staticmethod
+    def key(pkg_id: str, version: str, url: str) -> str:
+        return f"{pkg_id}/{version} {url}"
+
+    @staticmethod
+    def is_cacheable(record: Dict) -> bool:
+        """Whether a failed request (an ``HttpClient`` record) says the URL itself is bad."""
+        status = record.get("status")
+        if status is not None:
+            return status >= 400
+        return record.get("error") in ("TimeoutError", "timeout")
+
+    def is_fresh(self, entry: Optional[Dict], now: Optional[float] = None) -> bool:
+        if not entry:
+            return False
+        now = time.time() if now is None else now
+        return now - entry.get("failed_at", 0) < self.ttl_seconds
+
+    def fetch(self, pkg_id: str, version: str, url: str) -> Optional[str]:
+        key = self.key(pkg_id, version, url)
+        with self._lock:
+            entry = self.entries.get(key)
+            # Entries written before connection errors were excluded are ignored.
+            if self.enabled and self.is_fresh(entry) and self.is_cacheable(entry):
+                self.hits += 1
+                self.saved_seconds += entry.get("elapsed_ms", 0) / 1000
+                return None
+        text, record = HTTP_CLIENT.get(url)
+        with self._lock:
+            if text is None and self.is_cacheable(record):
+                self.entries[key] = {
+                    "failed_at": time.time(),
+                    "elapsed_ms": record.get("elapsed_ms", 0),
+                    "status": record.get("status"),
+                    "error": record.get("error"),
+                }
+                self._dirty = True
+            elif text is not None and self.entries.pop(key, None) is not None:
+                self._dirty = True
+        return text
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        now = time.time()
+        live = {k: v for k, v in self.entries.items() if self.is_fresh(v, now)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"entries": live}, indent=2, sort_keys=True), encoding="utf-8")
+        self._dirty = False
+
+    def summary(self) -> Dict:
+        return {
+            "path": str(self.path) if self.path else None,
+            "ttl_hours": self.ttl_seconds / 3600,
+            "retry_failed": not self.enabled,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
 
 
 def _parse_nuspec_metadata(root: ET.Element) -> Dict:
@@ -278,70 +606,148 @@ def read_nuspec(nuspec_path: Path) -> Dict:
         return info
 
 
+class _MappedArchive(mmap.mmap):
+    # zipfile needs seekable(), which mmap only gained in Python 3.13.
+    def seekable(self) -> bool:
+        return True
+
+
+class PackageInspector:
+    """Classifies the contents of package folders and .nupkg archives once.
+
+    An archive is memory-mapped and its entries are classified in a single
+    pass: the nuspec metadata is parsed and every license-like entry (by file
+    name or by the nuspec's license file hint) is read before it is closed.
+    Folder listings are taken with one ``scandir``. Results are memoized by
+    path and mtime, so later lookups for the same package reuse them.
+    """
+
+    def __init__(self) -> None:
+        self._archives: Dict[Tuple[str, int], Dict] = {}
+        self._folders: Dict[Tuple[str, int], Dict] = {}
+        self._lock = threading.Lock()
+
+    def folder(self, package_path: Path) -> Dict:
+        """Return ``{"nuspecs", "licenses", "dirs"}`` lists for the top level of ``package_path``."""
+        key = (str(package_path), package_path.stat().st_mtime_ns)
+        with self._lock:
+            if key in self._folders:
+                return self._folders[key]
+        lowered_targets = {n.lower() for n in LICENSE_FILE_NAMES}
+        listing: Dict[str, List[Path]] = {"nuspecs": [], "licenses": [], "dirs": []}
+        with os.scandir(package_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    listing["dirs"].append(Path(entry.path))
+                elif entry.is_file():
+                    lowered = entry.name.lower()
+                    if lowered.endswith(".nuspec"):
+                        listing["nuspecs"].append(Path(entry.path))
+                    elif lowered in lowered_targets:
+                        listing["licenses"].append(Path(entry.path))
+        with self._lock:
+            self._folders[key] = listing
+        return listing
+
+    def archive(self, nupkg_path: Path) -> Dict:
+        """Return ``{"names", "nuspec", "licenses"}`` for a .nupkg; ``licenses`` maps entry names to text."""
+        key = (str(nupkg_path), nupkg_path.stat().st_mtime_ns)
+        with self._lock:
+            if key in self._archives:
+                return self._archives[key]
+        result: Dict = {"names": [], "nuspec": {}, "licenses": {}}
+        try:
+            with nupkg_path.open("rb") as fh, _MappedArchive(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                with zipfile.ZipFile(buf) as zf:
+                    nuspec_name = None
+                    wanted: List[str] = []
+                    for name in zf.namelist():
+                        result["names"].append(name)
+                        lowered = name.lower()
+                        if lowered.endswith(".nuspec"):
+                            nuspec_name = nuspec_name or name
+                        elif lowered.split("/")[-1] in LICENSE_FILE_NAMES:
+                            wanted.append(name)
+                    if nuspec_name:
+                        try:
+                            result["nuspec"] = _parse_nuspec_metadata(ET.fromstring(zf.read(nuspec_name)))
+                        except Exception:
+                            pass
+                    hint = result["nuspec"].get("license")
+                    if hint:
+                        match = self._match_hint(result["names"], hint)
+                        if match and match not in wanted:
+                            wanted.append(match)
+                    for name in wanted:
+                        result["licenses"][name] = zf.read(name).decode("utf-8", errors="replace")
+        except Exception:
+            pass
+        with self._lock:
+            self._archives[key] = result
+        return result
+
+    @staticmethod
+    def _match_hint(names: List[str], hint: str) -> Optional[str]:
+        lowered = hint.lower()
+        return next((n for n in names if n.lower().endswith(lowered)), None)
+
+    def license_from_archive(self, nupkg_path: Path, hint: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        result = self.archive(nupkg_path)
+        candidate = self._match_hint(result["names"], hint) if hint else None
+        if candidate is None:
+            candidate = next((n for n in result["names"] if n.split("/")[-1].lower() in LICENSE_FILE_NAMES), None)
+        if candidate is None:
+            return None, None
+        text = result["licenses"].get(candidate)
+        if text is None:
+            # A caller-supplied hint the nuspec did not name; read just that entry.
+            try:
+                with zipfile.ZipFile(nupkg_path, "r") as zf:
+                    text = result["licenses"][candidate] = zf.read(candidate).decode("utf-8", errors="replace")
+            except Exception:
+                return None, None
+        return text, f"zip:{nupkg_path}:{candidate}"
+
+    def license_from_folder(self, package_path: Path, hint: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        if hint:
+            candidate = package_path / hint
+            if candidate.exists():
+                return candidate.read_text(encoding="utf-8", errors="replace"), f"file:{candidate}"
+        listing = self.folder(package_path)
+        lowered_targets = {n.lower() for n in LICENSE_FILE_NAMES}
+        found = listing["licenses"][:1]
+        for sub_dir in listing["dirs"] if not found else []:
+            with os.scandir(sub_dir) as entries:
+                found = [Path(e.path) for e in entries if e.is_file() and e.name.lower() in lowered_targets][:1]
+            if found:
+                break
+        if not found:
+            return None, None
+        return found[0].read_text(encoding="utf-8", errors="replace"), f"file:{found[0]}"
+
+
+PACKAGE_INSPECTOR = PackageInspector()
+
+
 def read_nuspec_from_zip(nupkg_path: Path) -> Dict:
     if not nupkg_path or not nupkg_path.exists():
         return {}
-    try:
-        with zipfile.ZipFile(nupkg_path, "r") as zf:
-            for name in zf.namelist():
-                if name.lower().endswith(".nuspec"):
-                    with zf.open(name) as fh:
-                        content = fh.read()
-                    try:
-                        root = ET.fromstring(content)
-                        return _parse_nuspec_metadata(root)
-                    except Exception:
-                        return {}
-    except Exception:
-        return {}
-    return {}
+    return PACKAGE_INSPECTOR.archive(nupkg_path)["nuspec"]
 
 
 def find_license_in_folder(package_path: Path, hint: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
     if not package_path or not package_path.exists():
         return None, None
-    if hint:
-        candidate = package_path / hint
-        if candidate.exists():
-            return candidate.read_text(encoding="utf-8", errors="replace"), f"file:{candidate}"
-    lowered_targets = {n.lower() for n in LICENSE_FILE_NAMES}
-    for entry in package_path.iterdir():
-        if entry.is_file() and entry.name.lower() in lowered_targets:
-            return entry.read_text(encoding="utf-8", errors="replace"), f"file:{entry}"
-    for entry in package_path.iterdir():
-        if entry.is_dir():
-            for sub in entry.iterdir():
-                if sub.is_file() and sub.name.lower() in lowered_targets:
-                    return sub.read_text(encoding="utf-8", errors="replace"), f"file:{sub}"
-    return None, None
+    return PACKAGE_INSPECTOR.license_from_folder(package_path, hint)
 
 
 def extract_license_from_nupkg(nupkg_path: Path, hint: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
     if not nupkg_path or not nupkg_path.exists():
         return None, None
-    try:
-        with zipfile.ZipFile(nupkg_path, "r") as zf:
-            names = zf.namelist()
-            candidates: List[str] = []
-            if hint:
-                for n in names:
-                    if n.lower().endswith(hint.lower()):
-                        candidates.append(n)
-                        break
-            if not candidates:
-                for n in names:
-                    base = n.split("/")[-1].lower()
-                    if base in LICENSE_FILE_NAMES:
-                        candidates.append(n)
-            for c in candidates:
-                with zf.open(c) as fh:
-                    return fh.read().decode("utf-8", errors="replace"), f"zip:{nupkg_path}:{c}"
-    except Exception:
-        return None, None
-    return None, None
+    return PACKAGE_INSPECTOR.license_from_archive(nupkg_path, hint)
 
 
-def fetch_spdx(license_id: str, allow_web: bool) -> Optional[str]:
+def fetch_spdx(license_id: str, allow_web: bool, fetch: Callable[[str], Optional[str]] = http_get_text) -> Optional[str]:
     if not license_id:
         return None
     lic = (
@@ -355,26 +761,258 @@ def fetch_spdx(license_id: str, allow_web: bool) -> Optional[str]:
     if not allow_web:
         return None
     url = SPDX_RAW + lic + ".txt"
-    return http_get_text(url)
-
+    return fetch(url)
+
+
+class LicenseCache:
+    """Content-addressed license store under ``.cache/licenses``.
+
+    Each distinct license is written once to ``blobs/<hash>.txt``, where the hash
+    is ``license_hash`` of its text, so packages sharing the same MIT or Apache
+    text share one file. ``index.json`` maps ``{pkg}-{version}`` to that hash and
+    records when the license was fetched, where it came from and when it was
+    last used. Entries older than ``ttl_hours`` are stale: they are refetched,
+    and only served again if no other source is available. ``prune`` evicts
+    least recently used entries once the blobs grow past a size cap.
+
+    Texts that never touch the disk, such as manual dependency licenses, can be
+    added with ``register`` so that every license of a run is reachable by hash.
+    """
+
+    def __init__(self, directory: Path = LICENSE_CACHE, ttl_hours: float = 24.0):
+        self.directory = directory
+        self.blob_dir = directory / "blobs"
+        self.index_path = directory / "index.json"
+        self.ttl_seconds = ttl_hours * 3600
+        self.entries: Dict[str, Dict] = {}
+        self.texts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if self.index_path.exists():
+            try:
+                self.entries = json.loads(self.index_path.read_text(encoding="utf-8")).get("entries", {})
+            except Exception:
+                self.entries = {}
+        self._migrate_legacy_files()
+
+    @staticmethod
+    def key(pkg_id: str, version: str) -> str:
+        return f"{pkg_id}-{version}"
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.txt"
+
+    def _migrate_legacy_files(self) -> None:
+        # Older versions of the script wrote one {pkg}-{version}.txt per package.
+        # The index is saved before the legacy files are removed, so no cached license is lost
+        # even when the caller never saves (e.g. ``cache stats``).
+        if not self.directory.exists():
+            return
+        legacy = sorted(self.directory.glob("*.txt"))
+        if not legacy:
+            return
+        for path in legacy:
+            text = path.read_text(encoding="utf-8", errors="replace")
+            normalized = normalize_license(text)
+            if normalized.cleaned and not normalized.has_placeholders and not normalized.is_spdx_template:
+                mtime = path.stat().st_mtime
+                entry = self.entries.get(path.stem) or {"fetched_at": mtime, "source": None, "repository": None}
+                entry.setdefault("last_used", mtime)
+                entry["hash"] = self._write_blob(text)
+                self.entries[path.stem] = entry
+        self._dirty = True
+        self.save()
+        for path in legacy:
+            path.unlink()
+
+    @staticmethod
+    def index_hashes(directory: Path = LICENSE_CACHE) -> Dict[str, Optional[str]]:
+        """License hash per cached package, read without migrating or writing anything.
+
+        Legacy ``{pkg}-{version}.txt`` files still waiting for migration are
+        reported by size and mtime.
+        """
+        try:
+            entries = json.loads((directory / "index.json").read_text(encoding="utf-8")).get("entries", {})
+        except Exception:
+            entries = {}
+        hashes = {key: entry.get("hash") for key, entry in entries.items()}
+        if directory.exists():
+            for path in directory.glob("*.txt"):
+                stat = path.stat()
+                hashes[path.stem] = f"legacy:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashes
+
+    def _write_blob(self, text: str) -> str:
+        digest = license_hash(text)
+        self.texts.setdefault(digest, text)
+        blob = self.blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            blob.write_text(text, encoding="utf-8")
+        return digest
+
+    def register(self, text: str) -> str:
+        """Make ``text`` reachable through ``text(hash)`` without caching it on disk."""
+        digest = license_hash(text)
+        with self._lock:
+            self.texts.setdefault(digest, text)
+        return digest
+
+    def text(self, digest: str) -> Optional[str]:
+        with self._lock:
+            if digest not in self.texts:
+                blob = self.blob_path(digest)
+                if not blob.exists():
+                    return None
+                self.texts[digest] = blob.read_text(encoding="utf-8", errors="replace")
+            return self.texts[digest]
+
+    def is_fresh(self, entry: Dict, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - entry.get("fetched_at", 0) < self.ttl_seconds
+
+    def lookup(self, pkg_id: str, version: str) -> Optional[Tuple[str, Dict, Path]]:
+        """Return ``(text, entry, blob_path)`` for a valid cached license, fresh or stale."""
+        key = self.key(pkg_id, version)
+        with self._lock:
+            entry = self.entries.get(key)
+            blob = self.blob_path(entry["hash"]) if entry and entry.get("hash") else None
+            if not blob or not blob.exists():
+                if self.entries.pop(key, None) is not None:
+                    self._dirty = True
+                return None
+            cached = self.texts.get(entry["hash"])
+            if cached is None:
+                cached = self.texts[entry["hash"]] = blob.read_text(encoding="utf-8", errors="replace")
+            normalized = normalize_license(cached)
+            if not cached or normalized.has_placeholders or normalized.is_spdx_template:
+                self.entries.pop(key, None)
+                self._dirty = True
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            return normalized.cleaned, dict(entry), blob
+
+    def store(self, pkg_id: str, version: str, text: str, source: Optional[str], repository: Optional[str]) -> Path:
+        now = time.time()
+        with self._lock:
+            digest = self._write_blob(text)
+            self.entries[self.key(pkg_id, version)] = {
+                "fetched_at": now,
+                "last_used": now,
+                "source": source,
+                "repository": repository,
+                "hash": digest,
+            }
+            self._dirty = True
+        return self.blob_path(digest)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.index_path.write_text(json.dumps({"entries": self.entries}, indent=2, sort_keys=True), encoding="utf-8")
+            self._dirty = False
+
+    def _blob_sizes(self) -> Dict[str, int]:
+        if not self.blob_dir.exists():
+            return {}
+        return {p.stem: p.stat().st_size for p in self.blob_dir.glob("*.txt")}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sizes = self._blob_sizes()
+            now = time.time()
+            fresh = sum(1 for e in self.entries.values() if self.is_fresh(e, now))
+            stamps = [e.get("last_used", 0) for e in self.entries.values()]
+            return {
+                "directory": str(self.directory),
+                "entries": len(self.entries),
+                "fresh": fresh,
+                "stale": len(self.entries) - fresh,
+                "blobs": len(sizes),
+                "bytes": sum(sizes.values()),
+                "oldest_use": min(stamps) if stamps else None,
+                "newest_use": max(stamps) if stamps else None,
+            }
 
-def acquire_license(pkg_id: str, version: str, package_path: Path, allow_web: bool, force_refresh: bool) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[Path]]:
-    cache_path = LICENSE_CACHE / f"{pkg_id}-{version}.txt"
-    if cache_path.exists() and not force_refresh:
-        cached = cache_path.read_text(encoding="utf-8", errors="replace")
-        if cached and not has_placeholders(cached) and not is_spdx_template(cached):
-            return clean_license_text(cached), "cache", None, cache_path
+    def prune(
+        self,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        keep: Optional[set] = None,
+    ) -> List[str]:
+        """Evict unused and least recently used entries; return the evicted keys.
+
+        Keys in ``keep`` (the packages of the current run) are never evicted,
+        even when that leaves the cache above ``max_bytes``.
+        """
+        keep = keep or set()
+        evicted: List[str] = []
+        with self._lock:
+            sizes = self._blob_sizes()
+            refs: Dict[str, int] = {}
+            for key in list(self.entries):
+                digest = self.entries[key].get("hash")
+                if digest not in sizes:
+                    del self.entries[key]
+                    self._dirty = True
+                    continue
+                refs[digest] = refs.get(digest, 0) + 1
+            total = sum(sizes[d] for d in refs)
+            now = time.time()
+            for key, entry in sorted(self.entries.items(), key=lambda kv: kv[1].get("last_used", 0)):
+                too_old = max_age_days is not None and now - entry.get("last_used", 0) > max_age_days * 86400
+                too_big = max_bytes is not None and total > max_bytes
+                if key in keep or not (too_old or too_big):
+                    continue
+                evicted.append(key)
+                digest = entry["hash"]
+                refs[digest] -= 1
+                if not refs[digest]:
+                    total -= sizes[digest]
+            for key in evicted:
+                del self.entries[key]
+                self._dirty = True
+            for digest in sizes:
+                if not refs.get(digest):
+                    # In-memory texts stay: they may be registered texts used by this run.
+                    self.blob_path(digest).unlink()
+        self.save()
+        return evicted
+
+
+def acquire_license(
+    pkg_id: str,
+    version: str,
+    package_path: Path,
+    allow_web: bool,
+    force_refresh: bool,
+    negative_cache: Optional[NegativeCache] = None,
+    license_cache: Optional[LicenseCache] = None,
+) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[Path]]:
+    license_cache = license_cache or LicenseCache()
+    cached = None if force_refresh else license_cache.lookup(pkg_id, version)
+    if cached and license_cache.is_fresh(cached[1]):
+        return cached[0], "cache", cached[1].get("repository"), cached[2]
     nuspec_info: Dict = {}
     text: Optional[str] = None
     source: Optional[str] = None
     repo_url: Optional[str] = None
 
-    nuspec_file = package_path / f"{pkg_id}.nuspec" if package_path else None
-    if nuspec_file and not nuspec_file.exists():
-        nuspec_candidates = list(package_path.glob("*.nuspec")) if package_path else []
-        if nuspec_candidates:
-            nuspec_file = nuspec_candidates[0]
-    if nuspec_file and nuspec_file.exists():
+    def fetch(url: str) -> Optional[str]:
+        if negative_cache:
+            return negative_cache.fetch(pkg_id, version, url)
+        return http_get_text(url)
+
+    nuspec_file = None
+    if package_path and package_path.is_dir():
+        nuspecs = PACKAGE_INSPECTOR.folder(package_path)["nuspecs"]
+        exact = package_path / f"{pkg_id}.nuspec"
+        nuspec_file = exact if exact in nuspecs else next(iter(nuspecs), None)
+    if nuspec_file:
         nuspec_info = read_nuspec(nuspec_file)
 
     if package_path:
@@ -392,45 +1030,75 @@ def acquire_license(pkg_id: str, version: str, package_path: Path, allow_web: bo
             nuspec_info = read_nuspec_from_zip(nupkg_path)
 
     if not text and nuspec_info.get("license_type") == "expression":
-        text = fetch_spdx(nuspec_info.get("license"), allow_web)
+        text = fetch_spdx(nuspec_info.get("license"), allow_web, fetch)
         source = source or "spdx-expression"
 
     if not text and allow_web and nuspec_info.get("license_url"):
-        text = http_get_text(nuspec_info["license_url"])
+        text = fetch(nuspec_info["license_url"])
         source = source or nuspec_info.get("license_url")
 
     if not text and allow_web and nuspec_info.get("repository"):
         repo_url = nuspec_info.get("repository")
-        text = http_get_text(repo_url.rstrip("/") + "/blob/master/LICENSE?plain=1")
+        text = fetch(repo_url.rstrip("/") + "/blob/master/LICENSE?plain=1")
         if not text:
-            text = http_get_text(repo_url.rstrip("/") + "/blob/main/LICENSE?plain=1")
+            text = fetch(repo_url.rstrip("/") + "/blob/main/LICENSE?plain=1")
         if text:
             source = source or repo_url
     repo_url = repo_url or nuspec_info.get("repository")
 
     if text:
-        cleaned = clean_license_text(text)
-        if cleaned and not has_placeholders(cleaned) and not is_spdx_template(cleaned):
-            cache_path.parent.mkdir(parents=True, exist_ok=True)
-            cache_path.write_text(cleaned, encoding="utf-8")
-            return cleaned, source, repo_url, cache_path
+        normalized = normalize_license(text)
+        if normalized.cleaned and not normalized.has_placeholders and not normalized.is_spdx_template:
+            cache_path = license_cache.store(pkg_id, version, normalized.cleaned, source, repo_url)
+            return normalized.cleaned, source, repo_url, cache_path
+    if cached:
+        # Nothing better is reachable right now; a stale license beats a missing one.
+        return cached[0], "cache (stale)", cached[1].get("repository"), cached[2]
     return None, source, repo_url, None
 
 
-def load_manual_packages() -> List[Dict]:
+def acquire_licenses(
+    targets: List[Tuple[str, str, Optional[Path]]],
+    allow_web: bool,
+    force_refresh: bool,
+    jobs: int = 1,
+    negative_cache: Optional[NegativeCache] = None,
+    license_cache: Optional[LicenseCache] = None,
+) -> List[Tuple[Optional[str], Optional[str], Optional[str], Optional[Path]]]:
+    """Run acquire_license for every (pkg_id, version, package_path) on a bounded pool.
+
+    Results are returned in the order of ``targets`` so the output does not
+    depend on which download finishes first.
+    """
+    license_cache = license_cache or LicenseCache()
+
+    def work(target: Tuple[str, str, Optional[Path]]):
+        pkg_id, version, package_path = target
+        return acquire_license(
+            pkg_id, version, package_path, allow_web, force_refresh, negative_cache, license_cache
+        )
+
+    if jobs <= 1 or len(targets) <= 1:
+        return [work(t) for t in targets]
+    with ThreadPoolExecutor(max_workers=min(jobs, len(targets))) as pool:
+        return list(pool.map(work, targets))
+
+
+def load_manual_packages(license_cache: LicenseCache) -> List[Dict]:
     manual: List[Dict] = []
     for entry in MANUAL_DEPENDENCIES:
         lic_path = entry.get("license_path")
-        text = None
+        digest = None
         if lic_path and Path(lic_path).exists():
             text = clean_license_text(Path(lic_path).read_text(encoding="utf-8", errors="replace"))
+            digest = license_cache.register(text) if text else None
         for pkg in entry.get("packages", []):
             manual.append(
                 {
                     "id": pkg,
                     "version": "local",
                     "family": entry.get("family"),
-                    "license_text": text,
+                    "license_hash": digest,
                     "source": str(lic_path) if lic_path else None,
                     "package_path": str(lic_path.parent) if lic_path else None,
                 }
@@ -438,7 +1106,7 @@ def load_manual_packages() -> List[Dict]:
     return manual
 
 
-def build_sections(packages: List[Dict]) -> Tuple[Dict[str, str], List[Dict]]:
+def build_sections(packages: List[Dict], license_cache: LicenseCache) -> Tuple[Dict[str, str], List[Dict]]:
     family_map: Dict[str, List[Dict]] = {}
     for pkg in packages:
         fam = pkg["family"]
@@ -447,16 +1115,17 @@ def build_sections(packages: List[Dict]) -> Tuple[Dict[str, str], List[Dict]]:
     warnings: List[Dict] = []
     org_lookup = { (entry.get("name") or entry.get("id")): entry for entry in load_org_config() }
     for fam, pkgs in sorted(family_map.items(), key=lambda kv: kv[0].lower()):
-        texts = [p.get("license_text") or "" for p in pkgs]
+        hashes = [p.get("license_hash") or license_hash("") for p in pkgs]
+        texts = {digest: license_cache.text(digest) or "" for digest in hashes}
         org_entry = org_lookup.get(fam)
-        canonical_text, warn = pick_canonical_license(texts, org_entry)
+        canonical, warn = pick_canonical_license(hashes, texts, org_entry)
         if warn:
             warnings.append({"family": fam, "variants": warn, "packages": [p["id"] for p in pkgs]})
-        sections[fam] = indent_block(canonical_text.strip()) + "\n"
+        sections[fam] = indent_block(texts[canonical].strip()) + "\n"
     return sections, warnings
 
 
-def write_notices(path: Path, preamble: str, sections: Dict[str, str]) -> None:
+def render_notices(preamble: str, sections: Dict[str, str]) -> str:
     order = sorted(sections.keys(), key=str.lower)
     out_lines: List[str] = []
     if preamble.strip():
@@ -467,30 +1136,265 @@ def write_notices(path: Path, preamble: str, sections: Dict[str, str]) -> None:
         out_lines.append("")
         out_lines.append(sections[name].rstrip())
         out_lines.append("")
-    path.write_text("\n".join(out_lines).rstrip() + "\n", encoding="utf-8")
+    return "\n".join(out_lines).rstrip() + "\n"
+
+
+def write_notices(path: Path, preamble: str, sections: Dict[str, str], text: Optional[str] = None) -> bool:
+    """Write the notices file if its content changed; ``text`` is a pre-rendered copy."""
+    return write_text_if_changed(path, text if text is not None else render_notices(preamble, sections))
 
 
-def sync_families_config(path: Path, family_packages: Dict[str, List[str]]) -> None:
+def sync_families_config(path: Path, family_packages: Dict[str, List[str]]) -> bool:
     data = {"version": "1.0", "families": []}
     for fam, pkgs in sorted(family_packages.items(), key=lambda kv: kv[0].lower()):
         data["families"].append({"name": fam, "retain": True, "packages": sorted(pkgs)})
-    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    return write_text_if_changed(path, json.dumps(data, indent=2))
+
+
+def select_packages(patterns: List[str], candidates: List[str]) -> List[str]:
+    """Expand ``--package`` ids/globs (case-insensitive) against the direct packages."""
+    selected: List[str] = []
+    for pattern in patterns:
+        matches = [pkg for pkg in candidates if fnmatch.fnmatchcase(pkg.lower(), pattern.lower())]
+        if not matches:
+            print(f"Warning: {pattern} is not a direct PackageReference; continuing anyway.", file=sys.stderr)
+            if not any(ch in pattern for ch in "*?["):
+                matches = [pattern]
+        selected.extend(pkg for pkg in matches if pkg not in selected)
+    return selected
+
+
+def collect_packages(
+    target_packages: List[str],
+    resolved: Dict[str, Dict],
+    args: argparse.Namespace,
+    license_cache: LicenseCache,
+    negative_cache: NegativeCache,
+    package_to_family: Dict[str, str],
+    orgs: List[Dict],
+) -> Tuple[List[Dict], List[str]]:
+    """Acquire licenses for ``target_packages`` and build their package entries.
+
+    A package resolved to several versions (across the projects of a
+    solution) gets one entry, and one license lookup, per distinct version.
+    """
+    packages: List[Dict] = []
+    missing: List[str] = []
+    pending: List[Tuple[str, str, Optional[Path]]] = []
+    for pkg in target_packages:
+        for version, package_path in package_versions(resolved.get(pkg, {})):
+            pending.append((pkg, version, package_path))
+    acquired = dict(
+        zip(
+            ((t[0], t[1]) for t in pending),
+            acquire_licenses(
+                pending, args.allow_web, args.force_refresh, args.jobs, negative_cache, license_cache
+            ),
+        )
+    )
+
+    for pkg in target_packages:
+        versions = package_versions(resolved.get(pkg, {}))
+        if not versions:
+            missing.append(f"{pkg} (version not resolved)")
+            continue
+        for version, package_path in versions:
+            text, source, repo_url, cache_path = acquired[(pkg, version)]
+            if not text:
+                missing.append(f"{pkg} {version}")
+                continue
+            owner = extract_github_owner(repo_url)
+            packages.append(
+                {
+                    "id": pkg,
+                    "version": version,
+                    "license_hash": license_cache.register(text),
+                    "source": source,
+                    "package_path": str(package_path) if package_path else None,
+                    "cache_path": str(cache_path) if cache_path else None,
+                    "repository": repo_url,
+                    "owner": owner,
+                    "family": choose_family(pkg, owner, package_to_family, orgs),
+                }
+            )
+    return packages, missing
+
+
+def cached_family(
+    pkg: str,
+    resolved: Dict[str, Dict],
+    license_cache: LicenseCache,
+    package_to_family: Dict[str, str],
+    orgs: List[Dict],
+) -> str:
+    """Family of ``pkg`` as of the last run, without acquiring its license."""
+    version = resolved.get(pkg, {}).get("version") or ""
+    entry = license_cache.entries.get(LicenseCache.key(pkg, version)) or {}
+    return choose_family(pkg, extract_github_owner(entry.get("repository")), package_to_family, orgs)
+
+
+def merge_family_packages(families_cfg: Dict, family_packages: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Overlay recomputed families on the existing config, moving packages that changed family."""
+    moved = {pkg for pkgs in family_packages.values() for pkg in pkgs}
+    merged: Dict[str, List[str]] = {}
+    for entry in families_cfg.get("families", []):
+        name = entry.get("name")
+        kept = [pkg for pkg in entry.get("packages") or [] if pkg not in moved]
+        if name and kept:
+            merged[name] = kept
+    merged.update(family_packages)
+    return merged
+
+
+def input_fingerprint(args: argparse.Namespace) -> str:
+    """Hash every input of a run, so an unchanged tree can be detected without doing the work.
+
+    Covers the project, props, solution and assets inputs, the families and
+    orgs configs, the manual license files, the current notices file, the
+    package-to-license hashes of the license cache, this tooling's source and
+    the options that change the output.
+    """
+    digest = hashlib.sha256()
+
+    def add(label: str, data: bytes) -> None:
+        digest.update(label.encode("utf-8") + b"\0" + hashlib.sha256(data).digest())
+
+    files: List[Path] = []
+    if args.solution:
+        files.append(args.solution)
+        # Test projects too: whether a project counts as one can change the package set.
+        for project in load_solution_projects(args.solution, include_tests=True):
+            files.append(project)
+            files.extend(evaluate_msbuild_props(project)[2])
+            assets = project.parent / "obj" / "project.assets.json"
+            add(f"assets:{assets}", assets_fingerprint(assets).encode("ascii"))
+    else:
+        files.append(args.csproj)
+        if args.props is None or args.props.exists():
+            files.extend(evaluate_msbuild_props(args.csproj, args.props)[2])
+        else:
+            files.append(args.props)
+        add(f"assets:{args.assets}", assets_fingerprint(args.assets).encode("ascii"))
+    files += [FAMILIES_CFG, ORG_CFG, args.notices, Path(__file__).resolve()]
+    files.append(Path(__file__).resolve().with_name("third_party_common.py"))
+    files += [Path(entry["license_path"]) for entry in MANUAL_DEPENDENCIES if entry.get("license_path")]
+    for path in files:
+        add(f"file:{path}", path.read_bytes() if path.is_file() else b"")
+
+    license_hashes = LicenseCache.index_hashes()
+    add("licenses", json.dumps(license_hashes, sort_keys=True).encode("utf-8"))
+    options = {
+        name: str(getattr(args, name))
+        for name in ("package", "transitive", "all_targets", "allow_web", "no_sync_families", "notices", "check")
+    }
+    add("options", json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_last_fingerprint(path: Path = FINGERPRINT_FILE) -> Optional[str]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("fingerprint")
+    except Exception:
+        return None
+
+
+def save_fingerprint(fingerprint: str, path: Path = FINGERPRINT_FILE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"fingerprint": fingerprint, "saved_at": time.time()}, indent=2), encoding="utf-8")
+
+
+def run_cache_command(args: argparse.Namespace) -> int:
+    cache = LicenseCache(ttl_hours=args.cache_ttl_hours)
+    if args.cache_command == "prune":
+        max_mb = args.max_mb if args.max_mb is not None else args.cache_max_mb
+        evicted = cache.prune(int(max_mb * 1024 * 1024), args.max_age_days)
+        for key in evicted:
+            print(f" - evicted {key}")
+        print(f"Pruned {len(evicted)} cached license(s) from {cache.directory}")
+        responses = HTTP_CLIENT.prune(int(max_mb * 1024 * 1024), args.max_age_days)
+        print(f"Pruned {responses} cached HTTP response(s) from {HTTP_CLIENT.cache_dir}")
+    stats = cache.stats()
+    for field in ("directory", "entries", "fresh", "stale", "blobs", "bytes"):
+        print(f"{field}: {stats[field]}")
+    http_stats = HTTP_CLIENT.stats()
+    for field in ("directory", "responses", "bytes"):
+        print(f"http_{field}: {http_stats[field]}")
+    return 0
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Update THIRD-PARTY-NOTICES.md.")
     parser.add_argument("--csproj", type=Path, default=CS_PROJ)
-    parser.add_argument("--props", type=Path, default=PROPS)
+    parser.add_argument(
+        "--solution",
+        type=Path,
+        help="Scan every project in this solution (e.g. ProjectRover.sln) instead of --csproj/--props/--assets.",
+    )
+    parser.add_argument("--props", type=Path, help="Central versions file (default: Directory.Packages.props found above --csproj).")
     parser.add_argument("--assets", type=Path, default=ASSETS)
     parser.add_argument("--notices", type=Path, default=NOTICES)
     parser.add_argument("--trace", type=Path, help="Write trace to this path (default .cache/update_trace.json).")
     parser.add_argument("--allow-web", action="store_true", help="Allow fetching licenseUrl/repository/SPDX over HTTP.")
     parser.add_argument("--force-refresh", action="store_true", help="Ignore cached license files.")
     parser.add_argument("--dry-run", action="store_true", help="Show planned changes without writing files.")
+    parser.add_argument("--no-skip", action="store_true", help="Run even if the inputs match the last successful run.")
     parser.add_argument("--no-sync-families", action="store_true", help="Do not rewrite third-party-families.json.")
-    parser.add_argument("--package", help="Update only the specified package (incremental mode).")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Run check_third_party.py's checks on the planned notices before writing; nothing is written on errors. "
+        "Exits with the checker's code (2 errors, 1 warnings).",
+    )
+    parser.add_argument(
+        "--package",
+        action="extend",
+        nargs="+",
+        help="Update only these packages (ids or globs such as 'Avalonia.*') and the families they belong to, "
+        "splicing the recomputed sections into the existing notices.",
+    )
+    parser.add_argument(
+        "--transitive",
+        action="store_true",
+        help="Include every package reachable from the direct references in project.assets.json.",
+    )
+    parser.add_argument(
+        "--all-targets",
+        action="store_true",
+        help="Resolve packages across every target framework/runtime in project.assets.json, not just the first.",
+    )
+    parser.add_argument(
+        "--negative-ttl-hours",
+        type=float,
+        default=24.0,
+        help="How long a failed license URL is skipped before it is tried again (default 24).",
+    )
+    parser.add_argument("--retry-failed", action="store_true", help="Retry license URLs recorded as failed.")
+    parser.add_argument("--jobs", type=int, default=8, help="Number of packages to acquire licenses for in parallel (default 8).")
+    parser.add_argument("--cache-ttl-hours", type=float, default=24.0, help="Cached licenses older than this are refetched (default 24).")
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=50.0,
+        help="Evict least recently used cached licenses, and HTTP responses, beyond this size each (default 50).",
+    )
+    commands = parser.add_subparsers(dest="command")
+    cache_parser = commands.add_parser("cache", help="Inspect or prune the license and HTTP caches.")
+    cache_commands = cache_parser.add_subparsers(dest="cache_command", required=True)
+    cache_commands.add_parser("stats", help="Show license and HTTP cache statistics.")
+    prune_parser = cache_commands.add_parser("prune", help="Evict least recently used cached licenses and HTTP responses.")
+    prune_parser.add_argument("--max-mb", type=float, help="Size cap in megabytes for each cache (default --cache-max-mb).")
+    prune_parser.add_argument("--max-age-days", type=float, help="Also evict entries not used for this many days.")
     args = parser.parse_args()
 
+    if args.command == "cache":
+        return run_cache_command(args)
+
+    # Nothing changed since the last successful run: skip all work and leave every file alone.
+    if not (args.dry_run or args.force_refresh or args.no_skip):
+        if load_last_fingerprint() == input_fingerprint(args):
+            print(f"{args.notices} is up to date (inputs unchanged since the last run).")
+            return 0
+
     import datetime
 
     # Prepare run directories and default trace location
@@ -500,94 +1404,151 @@ def main() -> int:
     run_dir.mkdir(parents=True, exist_ok=True)
     trace_path = args.trace or (Path(".cache") / "update_trace.json")
 
-    direct_packages = load_direct_packages(args.csproj)
+    if args.solution:
+        direct_packages, resolved = resolve_solution_packages(
+            args.solution, args.all_targets, args.jobs, args.transitive
+        )
+        source_name = args.solution
+        version_differences = {
+            pkg: info["versions"] for pkg, info in resolved.items() if len(set(info["versions"].values())) > 1
+        }
+        difference_label = "projects"
+        assets_targets: List[str] = []
+    else:
+        direct_packages = load_direct_packages(args.csproj)
+        source_name = args.csproj
+        central_versions = {**load_central_versions(args.props, args.csproj), **load_inline_versions(args.csproj)}
+        assets_index = AssetsIndex(load_assets(args.assets), all_targets=args.all_targets)
+        if args.transitive:
+            direct_packages = assets_index.closure(direct_packages)
+        resolved = resolve_packages(direct_packages, central_versions, assets_index)
+        version_differences = assets_index.version_differences()
+        difference_label = "targets"
+        assets_targets = assets_index.target_names
     if not direct_packages:
-        print(f"No PackageReference entries found in {args.csproj}", file=sys.stderr)
+        print(f"No PackageReference entries found in {source_name}", file=sys.stderr)
         return 1
-
-    central_versions = load_central_versions(args.props)
-    assets = load_assets(args.assets)
-    resolved = resolve_packages(direct_packages, central_versions, assets)
+    if version_differences:
+        print(f"Packages resolved to different versions across {difference_label}:", file=sys.stderr)
+        for pkg, per_scope in version_differences.items():
+            details = ", ".join(f"{scope}={version}" for scope, version in per_scope.items())
+            print(f" - {pkg}: {details}", file=sys.stderr)
 
     families_cfg, package_to_family = load_families_config(FAMILIES_CFG)
     orgs = load_org_config()
 
-    packages: List[Dict] = []
-    missing: List[str] = []
+    license_cache = LicenseCache(ttl_hours=args.cache_ttl_hours)
+    negative_cache = NegativeCache(ttl_hours=args.negative_ttl_hours, enabled=not args.retry_failed)
+    incremental = bool(args.package)
+    target_packages = select_packages(args.package, direct_packages) if incremental else direct_packages
+    packages, missing = collect_packages(
+        target_packages, resolved, args, license_cache, negative_cache, package_to_family, orgs
+    )
+    affected: Optional[set] = None
+    if incremental:
+        # A family section is rendered from all of its members, so pull in the
+        # other packages that were in the touched families at the last run.
+        affected = {pkg["family"] for pkg in packages}
+        affected |= {cached_family(pkg, resolved, license_cache, package_to_family, orgs) for pkg in target_packages}
+        members = [
+            pkg
+            for pkg in direct_packages
+            if pkg not in target_packages
+            and cached_family(pkg, resolved, license_cache, package_to_family, orgs) in affected
+        ]
+        more_packages, more_missing = collect_packages(
+            members, resolved, args, license_cache, negative_cache, package_to_family, orgs
+        )
+        packages += more_packages
+        missing += more_missing
+        affected |= {pkg["family"] for pkg in more_packages}
+        if affected:
+            print(f"Incremental update of {len(packages)} package(s) in: {', '.join(sorted(affected, key=str.lower))}")
+    negative_cache.save()
+    license_cache.prune(
+        int(args.cache_max_mb * 1024 * 1024),
+        keep={LicenseCache.key(pkg["id"], pkg["version"]) for pkg in packages},
+    )
+    HTTP_CLIENT.prune(int(args.cache_max_mb * 1024 * 1024))
+    if negative_cache.hits:
+        print(
+            f"Skipped {negative_cache.hits} known-failed license URL(s), "
+            f"saving ~{negative_cache.saved_seconds:.1f}s (use --retry-failed to retry them)."
+        )
 
     # Manual dependencies from project references
-    for manual_pkg in load_manual_packages():
-        if not manual_pkg.get("license_text"):
+    for manual_pkg in load_manual_packages(license_cache):
+        if affected is not None and manual_pkg["family"] not in affected:
+            continue
+        if not manual_pkg.get("license_hash"):
             missing.append(f"{manual_pkg['id']} (manual license missing)")
         packages.append(manual_pkg)
 
-    target_packages = direct_packages
-    package_mode = False
-    if getattr(args, "package", None):
-        package_mode = True
-        if args.package not in direct_packages:
-            print(f"Warning: {args.package} is not a direct PackageReference; continuing anyway.", file=sys.stderr)
-        target_packages = [args.package]
-
-    for pkg in target_packages:
-        info = resolved.get(pkg, {})
-        version = info.get("version")
-        package_path = info.get("package_path")
-        if not version:
-            missing.append(f"{pkg} (version not resolved)")
-            continue
-        text, source, repo_url, cache_path = acquire_license(pkg, version, package_path, args.allow_web, args.force_refresh)
-        if not text:
-            missing.append(f"{pkg} {version}")
-            continue
-        owner = extract_github_owner(repo_url)
-        packages.append(
-            {
-                "id": pkg,
-                "version": version,
-                "license_text": text,
-                "source": source,
-                "package_path": str(package_path) if package_path else None,
-                "cache_path": str(cache_path) if cache_path else None,
-                "repository": repo_url,
-                "owner": owner,
-                "family": choose_family(pkg, owner, package_to_family, orgs),
-            }
-        )
-
     if missing:
         print("Missing licenses for:", file=sys.stderr)
         for m in missing:
             print(f" - {m}", file=sys.stderr)
         return 2
 
-    sections, warnings = build_sections(packages)
-
-    # Retain manual non-package sections if present.
-    preamble, existing_sections = read_sections(args.notices)
-    # Save current notices snapshot for troubleshooting
-    (run_dir / "current_notices.md").write_text(
-        existing_sections and args.notices.read_text(encoding="utf-8") or "", encoding="utf-8"
-    )
-    for name in MANUAL_SECTIONS:
-        if name in existing_sections and name not in sections:
-            sections[name] = existing_sections[name]
-
-    new_text_lines = []
-    order = sorted(sections.keys(), key=str.lower)
-    if preamble.strip():
-        new_text_lines.append(preamble.rstrip())
-        new_text_lines.append("")
-    for name in order:
-        new_text_lines.append(f"## {name}")
-        new_text_lines.append("")
-        new_text_lines.append(sections[name].rstrip())
-        new_text_lines.append("")
-    new_text = "\n".join(new_text_lines).rstrip() + "\n"
+    sections, warnings = build_sections(packages, license_cache)
+
+    notices_index = load_notices_index(args.notices) if incremental else None
+    if notices_index and notices_index["sections"]:
+        # Only the recomputed sections whose body changed are rewritten; every other byte is kept.
+        preamble = ""
+        current_text = args.notices.read_text(encoding="utf-8")
+        (run_dir / "current_notices.md").write_text(current_text, encoding="utf-8")
+        changed = {
+            name: body
+            for name, body in sections.items()
+            if notices_index["sections"].get(name, {}).get("hash") != section_hash(body)
+        }
+        new_text = splice_sections(current_text, changed) if changed else current_text
+    else:
+        # Retain manual non-package sections if present.
+        preamble, existing_sections = read_sections(args.notices)
+        # Save current notices snapshot for troubleshooting
+        (run_dir / "current_notices.md").write_text(
+            existing_sections and args.notices.read_text(encoding="utf-8") or "", encoding="utf-8"
+        )
+        for name in MANUAL_SECTIONS:
+            if name in existing_sections and name not in sections:
+                sections[name] = existing_sections[name]
+        new_text = render_notices(preamble, sections)
 
     # Persist planned notices for troubleshooting
     (run_dir / "planned_notices.md").write_text(new_text, encoding="utf-8")
 
+    family_packages: Dict[str, List[str]] = {}
+    for pkg in packages:
+        members = family_packages.setdefault(pkg["family"], [])
+        if pkg["id"] not in members:
+            members.append(pkg["id"])
+    if incremental:
+        family_packages = merge_family_packages(families_cfg, family_packages)
+
+    check_result: Optional[int] = None
+    check_errors: List[str] = []
+    check_warnings: List[str] = []
+    if args.check:
+        # Validate the planned notices in memory, against the families config as it
+        # will be written, before anything is written.
+        if args.no_sync_families:
+            family_lookup = package_to_family
+        else:
+            family_lookup = {pkg: fam for fam, pkgs in family_packages.items() for pkg in pkgs}
+        planned_sections = split_sections(new_text)[1]
+        check_cache = load_check_cache()
+        check_errors, check_warnings, _ = check_notices(
+            index_notices(new_text.encode("utf-8"))["sections"],
+            planned_sections.get,
+            family_map(direct_packages, family_lookup),
+            check_cache,
+        )
+        save_check_cache(check_cache)
+        check_result = report(check_errors, check_warnings)
+    blocked = check_result == 2
+
     if args.dry_run:
         current = args.notices.read_text(encoding="utf-8") if args.notices.exists() else ""
         diff = difflib.unified_diff(
@@ -597,41 +1558,57 @@ def main() -> int:
             tofile=str(args.notices) + " (planned)",
         )
         print("".join(diff))
+    elif blocked:
+        print(f"Not writing {args.notices}: the planned notices fail the checks.", file=sys.stderr)
     else:
-        write_notices(args.notices, preamble, sections)
-        print(f"Updated {args.notices}")
+        if write_notices(args.notices, preamble, sections, new_text):
+            print(f"Updated {args.notices}")
+        else:
+            print(f"{args.notices} is unchanged")
+        update_notices_index(args.notices)
 
     # Sync family config unless disabled.
-    family_packages: Dict[str, List[str]] = {}
-    for pkg in packages:
-        family_packages.setdefault(pkg["family"], []).append(pkg["id"])
-    if not args.no_sync_families:
+    if not args.no_sync_families and not blocked:
         sync_families_config(FAMILIES_CFG, family_packages)
 
     diag = {
         "packages": packages,
+        "licenses": {p["license_hash"]: license_cache.text(p["license_hash"]) for p in packages},
         "warnings": warnings,
         "family_packages": family_packages,
         "notices": str(args.notices),
         "assets_path": str(args.assets),
+        "solution": str(args.solution) if args.solution else None,
+        "transitive": bool(args.transitive),
+        "assets_targets": assets_targets,
+        "version_differences": version_differences,
         "allow_web": args.allow_web,
+        "http": HTTP_CLIENT.trace,
+        "negative_cache": negative_cache.summary(),
         "run_dir": str(run_dir),
         "timestamp": timestamp,
         "dry_run": bool(args.dry_run),
     }
+    if args.check:
+        diag["check"] = {"result": check_result, "errors": check_errors, "warnings": check_warnings}
+    HTTP_CLIENT.close()
+
     # Write trace both to requested path (or default) and per-run folder
     trace_path.parent.mkdir(parents=True, exist_ok=True)
     trace_path.write_text(json.dumps(diag, indent=2), encoding="utf-8")
     (run_dir / "trace.json").write_text(json.dumps(diag, indent=2), encoding="utf-8")
     print(f"Wrote trace to {trace_path} and {run_dir/'trace.json'}")
 
+    if not args.dry_run and not check_result:
+        save_fingerprint(input_fingerprint(args))
+
     if warnings:
         print("Warnings: multiple license variants detected in families:", file=sys.stderr)
         for w in warnings:
             variants = w.get("variants") or w.get("details")
             print(f" - {w.get('family')}: {variants}", file=sys.stderr)
 
-    return 0
+    return check_result or 0
 
 
 if __name__ == "__main__":